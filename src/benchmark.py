@@ -0,0 +1,177 @@
+import argparse
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import config
+from instrumentation import instrument
+from sweep import METHODS, case_config, run_method
+
+COLUMNS = ("scenario", "method", "dt", "rtol", "steps", "crashed", "wall_time", "force_evaluations",
+           "peak_memory", "position_error", "energy_error")
+
+REFERENCE_RTOL = 1e-13
+REFERENCE_ATOL = 1e-6
+
+
+def run(main, method, cfg, rtol):
+    # Шаг метода Дормана-Принса выбирается сам, по сетке перебирается допуск
+    main._planet_grid.cache_clear()
+    if method == "dopri":
+        return main.dopri_method(cfg["X_SPACECRAFT"], cfg["Y_SPACECRAFT"], cfg["V_X_SPACECRAFT"], cfg["V_Y_SPACECRAFT"],
+                                 t_end=cfg["NUM_STEPS"] * cfg["DT"], rtol=rtol, atol=REFERENCE_ATOL, h=cfg["DT"])
+    return run_method(main, method, cfg)
+
+
+# Момент, в который заканчивается прогон случая: NUM_STEPS шагов по DT не всегда точно равны длительности
+# прогона, поэтому эталон считается до этого момента, а не до days суток
+def end_time(case):
+    return case["NUM_STEPS"] * case["DT"]
+
+
+def reference_solution(key):
+    # Эталон - метод Дормана-Принса с очень жёстким допуском до того же момента времени
+    import main
+
+    scenario, t_end = key
+    cfg = case_config(config.SCENARIOS[scenario])
+    vars(main).update(cfg)
+    main._planet_grid.cache_clear()
+    trajectory = main.dopri_method(cfg["X_SPACECRAFT"], cfg["Y_SPACECRAFT"], cfg["V_X_SPACECRAFT"],
+                                   cfg["V_Y_SPACECRAFT"], t_end=t_end, rtol=REFERENCE_RTOL, atol=REFERENCE_ATOL,
+                                   h=cfg["DT"])
+    if trajectory.crashed:
+        return None
+    final = main.Energy(trajectory.x[-1], trajectory.y[-1], trajectory.v_x[-1], trajectory.v_y[-1],
+                        trajectory.x_planet[-1], trajectory.y_planet[-1])
+    return trajectory.x[-1], trajectory.y[-1], final.total_energy
+
+
+def run_case(case):
+    # Выполняется в отдельном процессе. Время меряется отдельным прогоном без накладных расходов:
+    # tracemalloc и счётчики вычислений силы заметно замедляют интегрирование
+    import main
+
+    cfg = case_config(case)
+    vars(main).update(cfg)
+    method, rtol = case["method"], case.get("rtol", np.nan)
+
+    start = time.perf_counter()
+    trajectory = run(main, method, cfg, rtol)
+    wall_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    with instrument(vars(main)) as report:
+        run(main, method, cfg, rtol)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Энергия зонда при движущейся планете не сохраняется (в этом и смысл манёвра),
+    # поэтому её дрейф считается относительно эталона в конечный момент, а не относительно начальной
+    reference = case["reference"]
+    if reference is None or trajectory.crashed or not len(trajectory):
+        position_error = energy_error = np.nan
+    else:
+        position_error = float(np.hypot(trajectory.x[-1] - reference[0], trajectory.y[-1] - reference[1]))
+        final = main.Energy(trajectory.x[-1], trajectory.y[-1], trajectory.v_x[-1], trajectory.v_y[-1],
+                            trajectory.x_planet[-1], trajectory.y_planet[-1])
+        energy_error = abs(final.total_energy - reference[2]) / abs(reference[2])
+
+    steps = cfg["NUM_STEPS"] if method != "dopri" else trajectory.stats["accepted_steps"]
+    return {
+        "scenario": case["name"],
+        "method": method,
+        "dt": cfg["DT"] if method != "dopri" else np.nan,
+        "rtol": rtol,
+        "steps": steps,
+        "crashed": trajectory.crashed,
+        "wall_time": wall_time,
+        "force_evaluations": report.counters["force_evaluations"],
+        "peak_memory": peak_memory,
+        "position_error": position_error,
+        "energy_error": float(energy_error),
+    }
+
+
+def make_cases(scenarios, methods, dts, rtols, horizon):
+    cases = []
+    for name in scenarios:
+        base = dict(config.SCENARIOS[name], name=name)
+        for method in methods:
+            if method == "dopri":
+                cases += [dict(base, method=method, rtol=rtol, DT=min(dts), NUM_STEPS=int(round(horizon / min(dts))))
+                          for rtol in rtols]
+            else:
+                cases += [dict(base, method=method, DT=dt, NUM_STEPS=int(round(horizon / dt))) for dt in dts]
+    return cases
+
+
+def run_benchmark(scenarios=tuple(config.SCENARIOS), methods=METHODS, dts=(240, 120, 60, 30),
+                  rtols=(1e-6, 1e-8, 1e-10), days=10, workers=1):
+    # workers > 1 ускоряет прогон набора, но прогоны начинают делить ядра и кэш - время становится шумнее
+    horizon = days * 24 * 3600
+    cases = make_cases(scenarios, methods, dts, rtols, horizon)
+    keys = sorted({(case["name"], end_time(case)) for case in cases})
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        references = dict(zip(keys, executor.map(reference_solution, keys)))
+        for case in cases:
+            case["reference"] = references[case["name"], end_time(case)]
+        return list(executor.map(run_case, cases))
+
+
+def format_table(rows):
+    lines = ["\t".join(COLUMNS)]
+    for row in rows:
+        lines.append("\t".join(f"{row[c]:.6g}" if isinstance(row[c], float) else str(row[c]) for c in COLUMNS))
+    return "\n".join(lines)
+
+
+def read_table(path):
+    with open(path) as f:
+        header = f.readline().rstrip("\n").split("\t")
+        rows = []
+        for line in f:
+            row = dict(zip(header, line.rstrip("\n").split("\t")))
+            for name in header:
+                if name not in ("scenario", "method", "crashed"):
+                    row[name] = float(row[name])
+            row["crashed"] = row["crashed"] == "True"
+            rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение интеграторов по стоимости и точности")
+    parser.add_argument("--scenario", action="append", choices=sorted(config.SCENARIOS),
+                        help="сценарий из config.SCENARIOS (по умолчанию все)")
+    parser.add_argument("--method", action="append", choices=METHODS, help="метод (по умолчанию все)")
+    parser.add_argument("--dt", default="240,120,60,30", help="шаги по времени через запятую (с)")
+    parser.add_argument("--rtol", default="1e-6,1e-8,1e-10", help="допуски метода Дормана-Принса через запятую")
+    parser.add_argument("--days", type=float, default=10, help="длительность прогона (сутки)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", help="сохранить таблицу в файл (TSV)")
+    parser.add_argument("--plot", help="сохранить диаграммы работа-точность в файл")
+    parser.add_argument("--input", help="не считать заново, а построить диаграммы по сохранённой таблице")
+    args = parser.parse_args()
+
+    if args.input:
+        rows = read_table(args.input)
+    else:
+        rows = run_benchmark(args.scenario or tuple(config.SCENARIOS), args.method or METHODS,
+                             [float(v) for v in args.dt.split(",")], [float(v) for v in args.rtol.split(",")],
+                             args.days, args.workers)
+        table = format_table(rows)
+        print(table)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(table + "\n")
+
+    if args.plot or args.input:
+        from visualization import draw_work_precision
+        draw_work_precision(rows, args.plot)
+
+
+if __name__ == "__main__":
+    main()
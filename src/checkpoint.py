@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from trajectory import Trajectory, TrajectoryWriter
+
+
+# Отпечаток конфигурации прогона: параметры config.py (с учётом переопределений), метод и его параметры
+# (начальные условия, шаг). Продолжение при другой конфигурации дало бы другой результат, поэтому хэш проверяется
+def config_hash(config, method, params):
+    values = dict(config, **params, method=method)
+    text = json.dumps({name: value if isinstance(value, str) else float(value) for name, value in values.items()},
+                      sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# Периодическая запись контрольных точек интегратора: каждые every шагов в файл path (формат .npz).
+# Сохраняется всё, что нужно для продолжения без расхождения: состояние, время, номер шага,
+# история метода (например, кольцевой буфер Адамса), счётчики и уже полученная часть траектории
+# вместе с последним пропущенным при прореживании шагом (его дописывает trim() в конце прогона).
+# Траектория в памяти дописывается в path + ".rows" (сырые float64 построчно, как у TrajectoryWriter) только
+# новыми строками, а не переписывается целиком. rows - сколько строк там уже есть (при продолжении)
+class Checkpointer:
+    def __init__(self, path, every, config, rows=0):
+        self.path = path
+        self.every = every
+        self.config = config
+        self.rows = rows
+        self.saved = 0
+
+    # Точка пишется каждые every шагов и в конце прогона, чтобы законченный прогон можно было продлить
+    def due(self, step, num_steps):
+        return step % self.every == 0 or step == num_steps
+
+    def save(self, method, params, num_steps, step, t, state, trajectory, history=(), counters=None):
+        params = {name: value if isinstance(value, bool) else float(value) for name, value in params.items()}
+        meta = {"method": method, "params": params, "num_steps": num_steps, "step": step, "t": t,
+                "config_hash": config_hash(self.config, method, params), "counters": counters or {}}
+        if isinstance(trajectory, TrajectoryWriter):
+            # Записанная на диск часть траектории не копируется: запоминаем, сколько строк в файле
+            trajectory.flush()
+            meta["writer"] = {"path": trajectory.path, "length": trajectory.length,
+                              "every": trajectory.every, "skipped": trajectory._skipped,
+                              "pending": _pending(trajectory)}
+        else:
+            self._write_rows(trajectory)
+            meta["rows"] = self.rows
+            meta["sparse"] = {"every": trajectory._every, "skipped": trajectory._skipped,
+                              "pending": _pending(trajectory)}
+
+        # Сначала пишем во временный файл: прерывание во время записи не портит предыдущую точку
+        with open(self.path + ".tmp", "wb") as f:
+            np.savez(f, meta=json.dumps(meta), state=np.asarray(state, dtype=np.float64),
+                     history=np.asarray(history, dtype=np.float64))
+        os.replace(self.path + ".tmp", self.path)
+        self.saved += 1
+
+    # Строки после первых self.rows дописываются поверх всего, что осталось от прерванной записи:
+    # контрольная точка ссылается только на первые meta["rows"] строк, поэтому хвост файла ей не нужен
+    def _write_rows(self, trajectory):
+        with open(self.path + ".rows", "r+b" if self.rows else "wb") as f:
+            f.seek(self.rows * len(Trajectory.FIELDS) * np.dtype(np.float64).itemsize)
+            f.truncate()
+            f.write(np.ascontiguousarray(trajectory._data[:, self.rows:trajectory.length].T).tobytes())
+        self.rows = trajectory.length
+
+
+# Пропущенный при прореживании шаг (кортеж значений строки) в JSON метаданных и обратно
+def _pending(trajectory):
+    return None if trajectory._pending is None else [float(value) for value in trajectory._pending]
+
+
+def _restore(pending):
+    return None if pending is None else tuple(pending)
+
+
+class Checkpoint:
+    def __init__(self, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            self.state = data["state"]
+            self.history = data["history"]
+        self.method = meta["method"]
+        self.params = meta["params"]
+        self.num_steps = meta["num_steps"]
+        self.step = meta["step"]
+        self.t = meta["t"]
+        self.config_hash = meta["config_hash"]
+        self.counters = meta["counters"]
+        self.writer = meta.get("writer")
+        self.sparse = meta.get("sparse", {"every": 1, "skipped": 0})
+        if self.writer is None:
+            rows = np.fromfile(path + ".rows", dtype=np.float64, count=meta["rows"] * len(Trajectory.FIELDS))
+            self.rows = rows.reshape(meta["rows"], len(Trajectory.FIELDS)).T
+        else:
+            self.rows = np.empty((len(Trajectory.FIELDS), 0))
+
+    def check(self, config):
+        if config_hash(config, self.method, self.params) != self.config_hash:
+            raise ValueError("Контрольная точка записана при другой конфигурации")
+
+    # Траектория, в которую продолжается запись: уже посчитанные шаги плюс запас на оставшиеся
+    def trajectory(self, num_steps):
+        if self.writer is not None:
+            return TrajectoryWriter(self.writer["path"], every=self.writer["every"], length=self.writer["length"],
+                                    skipped=self.writer["skipped"], pending=_restore(self.writer.get("pending")))
+        every = self.sparse["every"]
+        trajectory = Trajectory(max(num_steps // every + 2, self.rows.shape[1]), every)
+        trajectory._data[:, :self.rows.shape[1]] = self.rows
+        trajectory.length = self.rows.shape[1]
+        trajectory._skipped = self.sparse["skipped"]
+        trajectory._pending = _restore(self.sparse.get("pending"))
+        return trajectory
+
@@ -0,0 +1,24 @@
+# Компенсированное суммирование для накопления состояния и времени на длинных прогонах.
+# Та же безошибочная операция two-sum, что и в конструкторе DoubleDouble (DoubleDouble/double_double.cpp):
+# значение хранится парой (старшая часть, младшая часть), и ошибка округления каждого шага не теряется
+
+
+# s + err == a + b точно (Кнут). Работает и для массивов NumPy поэлементно
+def two_sum(a, b):
+    s = a + b
+    t = s - a
+    return s, (a - (s - t)) + (b - t)
+
+
+# x += dx с переносом младшей части c: возвращает новые (x, c)
+def compensated_add(x, c, dx):
+    return two_sum(x, dx + c)
+
+
+# То же для массивов на месте: x и c обновляются, dx используется как временный буфер
+def compensated_add_inplace(x, c, dx):
+    dx += c
+    s = x + dx
+    t = s - x
+    c[...] = (x - (s - t)) + (dx - t)
+    x[...] = s
@@ -43,6 +43,20 @@ V_PLANET = 0.5e3                            # Начальная скорост
 # X_SPACECRAFT, Y_SPACECRAFT = 3 * R_PLANET, -4 * R_PLANET
 # V_X_SPACECRAFT, V_Y_SPACECRAFT = -18e3, -3e3
 
+# Те же сценарии в виде переопределений параметров для перебора (sweep.py)
+SCENARIOS = {
+    "gravity_assist": {"X_SPACECRAFT": 3 * R_PLANET, "Y_SPACECRAFT": 3 * R_PLANET,
+                       "V_X_SPACECRAFT": -13e3, "V_Y_SPACECRAFT": -2e3},
+    "crash": {"X_SPACECRAFT": 3 * R_PLANET, "Y_SPACECRAFT": -4 * R_PLANET,
+              "V_X_SPACECRAFT": -7e3, "V_Y_SPACECRAFT": -3.5e3},
+    "star_orbit": {"X_SPACECRAFT": 30 * R_PLANET, "Y_SPACECRAFT": -40 * R_PLANET,
+                   "V_X_SPACECRAFT": -37e3, "V_Y_SPACECRAFT": -3e3},
+    "planet_orbit": {"X_SPACECRAFT": 3 * R_PLANET, "Y_SPACECRAFT": -4 * R_PLANET,
+                     "V_X_SPACECRAFT": -7e3, "V_Y_SPACECRAFT": -3e3},
+    "parabola": {"X_SPACECRAFT": 3 * R_PLANET, "Y_SPACECRAFT": -4 * R_PLANET,
+                 "V_X_SPACECRAFT": -18e3, "V_Y_SPACECRAFT": -3e3},
+}
+
 DT = 60                                     # Шаг времени (с)
 DAY = 1440                                  # Минут в сутках
 NUM_STEPS = DAY * 1000                      # Количество шагов
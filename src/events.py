@@ -0,0 +1,90 @@
+import numpy as np
+
+
+# Событие - момент, когда function(t, state) меняет знак; state - [x, y, v_x, v_y].
+# direction: +1 - только переход снизу вверх, -1 - сверху вниз, 0 - любой.
+# terminal - остановить интегрирование в момент события, crash - событие означает столкновение.
+# measure(t, state) - величина, которая сохраняется вместе с событием (например, расстояние в перицентре)
+class Event:
+    def __init__(self, name, function, direction=0, terminal=False, crash=False, measure=None):
+        self.name = name
+        self.function = function
+        self.direction = direction
+        self.terminal = terminal
+        self.crash = crash
+        self.measure = measure
+
+    def crossed(self, g0, g1):
+        return (self.direction >= 0 and g0 < 0 <= g1) or (self.direction <= 0 and g0 > 0 >= g1)
+
+
+# Кубический эрмитов интерполянт на шаге [t0, t1] по состояниям и производным на концах
+def hermite(t0, y0, f0, t1, y1, f1, t):
+    h = t1 - t0
+    s = (t - t0) / h
+    return ((1 + 2 * s) * (1 - s)**2 * y0 + s * (1 - s)**2 * h * f0
+            + s**2 * (3 - 2 * s) * y1 + s**2 * (s - 1) * h * f1)
+
+
+# Корень g на [a, b] при g(a), g(b) разных знаков: метод ложного положения с модификацией Иллинойса
+def find_root(g, a, b, g_a, g_b, tolerance=1e-6, max_iterations=100):
+    side = 0
+    for _ in range(max_iterations):
+        if b - a <= tolerance:
+            break
+        c = (a * g_b - b * g_a) / (g_b - g_a)
+        g_c = g(c)
+        if g_c == 0:
+            return c
+        if (g_c > 0) == (g_b > 0):
+            b, g_b = c, g_c
+            if side == -1:
+                g_a /= 2
+            side = -1
+        else:
+            a, g_a = c, g_c
+            if side == 1:
+                g_b /= 2
+            side = 1
+
+    return a if abs(g_a) < abs(g_b) else b
+
+
+# Поиск событий между соседними узлами интегрирования. Функции событий вычисляются только в узлах;
+# при смене знака внутри шага состояние восстанавливается эрмитовым интерполянтом (две дополнительные
+# производные derivatives(t, state), только на шагах с событием) и момент уточняется поиском корня
+class EventDetector:
+    def __init__(self, events, derivatives, tolerance=1e-6):
+        self.events = list(events)
+        self.derivatives = derivatives
+        self.tolerance = tolerance
+        self.found = []
+        self._values = None
+
+    def check(self, t0, y0, t1, y1):
+        y0, y1 = np.asarray(y0, dtype=np.float64), np.asarray(y1, dtype=np.float64)
+        if self._values is None:
+            self._values = [event.function(t0, y0) for event in self.events]
+        values = [event.function(t1, y1) for event in self.events]
+
+        hits = []
+        f0 = f1 = None
+        for event, g0, g1 in zip(self.events, self._values, values):
+            if not event.crossed(g0, g1):
+                continue
+            if f0 is None:
+                f0, f1 = self.derivatives(t0, y0), self.derivatives(t1, y1)
+            state = lambda t: hermite(t0, y0, f0, t1, y1, f1, t)
+            t = find_root(lambda t: event.function(t, state(t)), t0, t1, g0, g1, self.tolerance)
+            hits.append((t, event, state(t)))
+        self._values = values
+
+        # События внутри шага - в хронологическом порядке, после терминального шаг обрывается
+        for t, event, state in sorted(hits, key=lambda hit: hit[0]):
+            record = {"name": event.name, "t": float(t), "state": state.tolist()}
+            if event.measure is not None:
+                record["value"] = float(event.measure(t, state))
+            self.found.append(record)
+            if event.terminal:
+                return event, t, state
+        return None
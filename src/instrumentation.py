@@ -0,0 +1,180 @@
+import cProfile
+import pstats
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+from trajectory import Trajectory, TrajectoryWriter
+
+# Журнал столкновений: ядра сил записывают сюда событие вместо печати (последние 1000 событий)
+crash_events = deque(maxlen=1000)
+_crash_sinks = [crash_events]
+
+
+def record_crash(body, x_sc, y_sc, distance):
+    event = {"body": body, "x": float(x_sc), "y": float(y_sc), "distance": float(distance)}
+    for sink in _crash_sinks:
+        sink.append(event)
+
+
+# Шаги интеграторов без траектории (пакетный RK4): остальные считаются по записи строк (append),
+# а такие методы сообщают число сделанных шагов сами. Без инструментирования вызов ничего не делает
+_step_counters = []
+
+
+def record_steps(count):
+    for counters in _step_counters:
+        counters["steps"] += count
+
+
+# Фазы, по которым раскладывается время счёта, и функции модуля main, которые к ним относятся
+PHASES = {
+    "force": ("planet_acceleration", "star_acceleration", "planet_acceleration_batch", "star_acceleration_batch",
+              "gravity_field"),
+    "ephemeris": ("move_planet", "planet_grid"),
+}
+# Каждое вычисление силы вызывает ровно одно из этих ядер; пакетное считает все зонды сразу
+FORCE_KERNELS = {"planet_acceleration": lambda args: 1, "gravity_field": lambda args: 1,
+                 "planet_acceleration_batch": lambda args: args[0].shape[1]}
+# Ядро движка N тел (nbody.py): System.accelerations(self, t, pos) считает все свободные тела сразу
+SYSTEM_FORCE_KERNEL = lambda args: args[2].shape[1]
+
+
+class Report:
+    def __init__(self):
+        self.calls = {}
+        self.times = {}
+        self.counters = {"force_evaluations": 0, "steps": 0}
+        self.integrators = {}
+        self.crashes = []
+        self._active = set()
+
+    def summary(self):
+        lines = [f"{'phase':<12}{'time, s':>12}"]
+        lines += [f"{phase:<12}{seconds:>12.4f}" for phase, seconds in sorted(self.times.items())]
+        lines.append(f"{'integrator':<24}{'runs':>6}{'time, s':>12}{'steps':>12}{'force evals':>14}")
+        for name, entry in self.integrators.items():
+            lines.append(f"{name:<24}{entry['runs']:>6}{entry['time']:>12.4f}{entry['steps']:>12}"
+                         f"{entry['force_evaluations']:>14}")
+        lines += [f"crash: {event}" for event in self.crashes]
+        return "\n".join(lines)
+
+
+def _timed(report, phase, name, func, evaluations=None):
+    def wrapper(*args, **kwargs):
+        report.calls[name] = report.calls.get(name, 0) + 1
+        if evaluations is not None:
+            report.counters["force_evaluations"] += evaluations(args)
+        if phase == "storage":
+            report.counters["steps"] += 1
+        # Вложенные вызовы той же фазы (planet_grid -> move_planet) не учитываются повторно
+        if phase in report._active:
+            return func(*args, **kwargs)
+        report._active.add(phase)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            report.times[phase] = report.times.get(phase, 0.0) + time.perf_counter() - start
+            report._active.discard(phase)
+    return wrapper
+
+
+def _integrator(report, name, func):
+    def wrapper(*args, **kwargs):
+        evaluations, steps = report.counters["force_evaluations"], report.counters["steps"]
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            entry = report.integrators.setdefault(name, {"runs": 0, "time": 0.0, "steps": 0, "force_evaluations": 0})
+            entry["runs"] += 1
+            entry["time"] += time.perf_counter() - start
+            entry["steps"] += report.counters["steps"] - steps
+            entry["force_evaluations"] += report.counters["force_evaluations"] - evaluations
+    return wrapper
+
+
+# Инструментирование на время блока with: функции модуля (по умолчанию main) и движка N тел (nbody.py)
+# подменяются обёртками со счётчиками и таймерами, на выходе восстанавливаются.
+# Вне блока код работает без всяких накладных расходов.
+# namespace - словарь глобальных имён модуля, например vars(main) или globals() изнутри main.py.
+# Обёртки сами добавляют время, поэтому сравнивать стоит доли фаз, а не абсолютные значения
+@contextmanager
+def instrument(namespace=None):
+    import nbody
+    if namespace is None:
+        import main
+        namespace = vars(main)
+    report = Report()
+    patched = []
+
+    def patch(owner, name, wrapper):
+        if isinstance(owner, dict):
+            patched.append((owner, name, owner[name]))
+            owner[name] = wrapper
+        else:
+            patched.append((owner, name, vars(owner)[name]))
+            setattr(owner, name, wrapper)
+
+    for phase, names in PHASES.items():
+        for name in names:
+            patch(namespace, name, _timed(report, phase, name, namespace[name], FORCE_KERNELS.get(name)))
+    for cls in (Trajectory, TrajectoryWriter):
+        patch(cls, "append", _timed(report, "storage", cls.__name__ + ".append", cls.append))
+    patch(namespace["Energy"], "__init__", _timed(report, "energy", "Energy", namespace["Energy"].__init__))
+    # resume_method только передаёт прогон интегратору, который учитывается сам - иначе прогон считался бы дважды
+    for name, func in list(namespace.items()):
+        if name.endswith("_method") and name != "resume_method" and callable(func):
+            patch(namespace, name, _integrator(report, name, func))
+
+    patch(nbody.System, "accelerations", _timed(report, "force", "System.accelerations", nbody.System.accelerations,
+                                                SYSTEM_FORCE_KERNEL))
+    patch(nbody.SystemTrajectory, "append", _timed(report, "storage", "SystemTrajectory.append",
+                                                   nbody.SystemTrajectory.append))
+    for name, func in list(vars(nbody).items()):
+        if name.endswith("_method") and callable(func):
+            patch(vars(nbody), name, _integrator(report, name, func))
+    _crash_sinks.append(report.crashes)
+    _step_counters.append(report.counters)
+
+    try:
+        yield report
+    finally:
+        _crash_sinks.remove(report.crashes)
+        _step_counters.remove(report.counters)
+        for owner, name, original in reversed(patched):
+            if isinstance(owner, dict):
+                owner[name] = original
+            else:
+                setattr(owner, name, original)
+
+
+class Profile:
+    def __init__(self, stats=None, peak_memory=None, snapshot=None):
+        self.stats = stats
+        self.peak_memory = peak_memory
+        self.snapshot = snapshot
+
+
+# Запуск любого интегратора (или другой функции) под cProfile (cpu) и/или tracemalloc (memory).
+# Возвращает результат функции и Profile: pstats.Stats, пик памяти в байтах и снимок выделений
+def profile(func, *args, cpu=True, memory=False, **kwargs):
+    profiler = cProfile.Profile() if cpu else None
+    if memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        report = Profile(pstats.Stats(profiler) if profiler is not None else None)
+        if memory:
+            report.peak_memory = tracemalloc.get_traced_memory()[1]
+            report.snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+    return result, report
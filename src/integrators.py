@@ -0,0 +1,393 @@
+import numpy as np
+
+from compensated import compensated_add, compensated_add_inplace
+
+# Общие циклы интегрирования для одного зонда (main.py) и системы тел (nbody.py).
+# Вектор состояния - [x_1..x_n, y_1..y_n, v_x_1..v_x_n, v_y_1..v_y_n], для одного зонда это [x, y, v_x, v_y].
+# Задача задаётся функцией derivatives(t, state) -> (f, crash): f - производная вектора состояния,
+# crash - маска (n,) тел, столкнувшихся в этой точке (для одного зонда - просто признак)
+
+# Таблица Бутчера метода Дормана-Принса 5(4)
+DOPRI_C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+DOPRI_A = np.array([
+    [0, 0, 0, 0, 0, 0],
+    [1/5, 0, 0, 0, 0, 0],
+    [3/40, 9/40, 0, 0, 0, 0],
+    [44/45, -56/15, 32/9, 0, 0, 0],
+    [19372/6561, -25360/2187, 64448/6561, -212/729, 0, 0],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656, 0],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+])
+DOPRI_B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+DOPRI_E = DOPRI_B - np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40])
+
+# Коэффициенты симплектического метода Иошиды 4-го порядка
+YOSHIDA_W1 = 1 / (2 - 2**(1/3))
+YOSHIDA_W0 = -2**(1/3) / (2 - 2**(1/3))
+YOSHIDA_C = (YOSHIDA_W1 / 2, (YOSHIDA_W0 + YOSHIDA_W1) / 2, (YOSHIDA_W0 + YOSHIDA_W1) / 2, YOSHIDA_W1 / 2)
+YOSHIDA_D = (YOSHIDA_W1, YOSHIDA_W0, YOSHIDA_W1)
+# Моменты вычисления силы внутри шага (доли шага) и конец шага
+YOSHIDA_OFFSETS = tuple(np.cumsum(YOSHIDA_C[:3])) + (1.0,)
+
+
+# Ход интегрирования, общий для всех методов. record(t, state) сохраняет шаг, crash(t, state, mask) сообщает
+# о столкнувшихся телах - они замораживаются, остальные летят дальше, а когда не остаётся никого, прогон
+# заканчивается. detector - EventDetector (события уточняются внутри шага, терминальное - в self.event),
+# compensated - компенсированное суммирование состояния (младшие части - self.low, их можно задать перед
+# продолжением прогона), save(step, t, state, low) - вызывается после каждого шага фиксированной длины
+# (контрольные точки). Время шагов фиксированной длины считается по номеру шага и не накапливается.
+# acceleration(x, y, t, planet) -> (a_x, a_y, crashed) и ephemeris(num_rows, offsets, dt, t_start) -
+# скалярный путь методов фиксированного шага для одного зонда: состояние - четыре питоновских числа,
+# положение планеты на стадиях берётся из эфемерид (track[step, k], как PlanetTrack), а record получает
+# его третьим аргументом
+class Stepper:
+    def __init__(self, derivatives, record, crash, detector=None, compensated=False, save=None, acceleration=None,
+                 ephemeris=None):
+        self.derivatives = derivatives
+        self.record = record
+        self.crash = crash
+        self.detector = detector
+        self.compensated = compensated
+        self.save = save
+        self.acceleration = acceleration
+        self.ephemeris = ephemeris
+        self.low = None
+        self.event = None
+        self.active = None
+        self.evaluations = 0
+        self.accepted = self.rejected = 0
+        self._mask = self._mask_half = None
+
+    def _start(self, state):
+        if self.compensated and self.low is None:
+            self.low = np.zeros_like(state)
+
+    # Учитываем новые столкнувшиеся тела; True - столкнулся кто-то ещё летевший
+    def _crashed(self, t, state, crash):
+        if self.active is not None:
+            crash = crash & self.active
+        # У одного зонда crash - просто признак, а проверка маски заметно дороже
+        if not (crash.any() if isinstance(crash, np.ndarray) else crash):
+            return False
+        crash = np.asarray(crash)
+        self.crash(t, state, crash)
+        self.active = ~crash if self.active is None else self.active & ~crash
+        self._mask = np.tile(self.active, 4)
+        self._mask_half = self._mask[len(self._mask) // 2:]
+        return True
+
+    @property
+    def finished(self):
+        return self.active is not None and not self.active.any()
+
+    # state + increment для новых массивов (RK4, Дорман-Принс)
+    def _add(self, state, increment):
+        if self._mask is not None:
+            increment *= self._mask
+        if self.low is None:
+            return state + increment
+        state, self.low = compensated_add(state, self.low, increment)
+        return state
+
+    # x += dx на месте для положений или скоростей (симплектические методы); low - та же часть self.low
+    def _increment(self, x, low, dx):
+        if self._mask_half is not None:
+            dx *= self._mask_half
+        if low is None:
+            x += dx
+        else:
+            compensated_add_inplace(x, low, dx)
+
+    # Младшие части скалярного пути: (c_x, c_y, c_v_x, c_v_y)
+    def _probe_low(self):
+        return (0.0, 0.0, 0.0, 0.0) if self.low is None else tuple(self.low.tolist())
+
+    # Завершение шага: события, запись и контрольная точка. True - прогон остановлен терминальным событием.
+    # В скалярном пути state - кортеж, planet - положение планеты в момент t, low - младшие части
+    def _finish(self, step, t0, y0, t, state, planet=None, low=None):
+        stop = False
+        if self.detector is not None:
+            hit = self.detector.check(t0, y0, t, state)
+            if hit is not None:
+                self.event, t, y = hit
+                if isinstance(state, np.ndarray):
+                    state[...] = y
+                else:
+                    state, planet = tuple(y.tolist()), None
+                if self.low is not None:
+                    self.low[...] = 0
+                stop = True
+        if planet is None:
+            self.record(t, state)
+        else:
+            self.record(t, state, planet)
+        if self.save is not None and not stop:
+            self.save(step, t, state, self.low if low is None else low)
+        return stop
+
+    # Метод Рунге-Кутты 4-го порядка: шаги first + 1..num_steps от узла first (t_start + first * dt)
+    def rk4(self, state, t_start, dt, num_steps, first=0):
+        self._start(state)
+        if self.acceleration is not None:
+            return self._rk4_probe(state, t_start, dt, num_steps, first)
+        for step in range(first + 1, num_steps + 1):
+            t = t_start + (step - 1) * dt
+            k1, c1 = self.derivatives(t, state)
+            k2, c2 = self.derivatives(t + 0.5 * dt, state + 0.5 * dt * k1)
+            k3, c3 = self.derivatives(t + 0.5 * dt, state + 0.5 * dt * k2)
+            k4, c4 = self.derivatives(t + dt, state + dt * k3)
+            self.evaluations += 4
+            # Столкнувшиеся на любой из стадий тела выбывают до обновления состояния
+            if self._crashed(t, state, c1 | c2 | c3 | c4) and self.finished:
+                break
+
+            start = state
+            state = self._add(state, (dt / 6) * (k1 + 2 * k2 + 2 * k3 + k4))
+            if self._finish(step, t, start, t_start + step * dt, state):
+                break
+
+    # Скалярный RK4 для одного зонда: планета - в начале, середине и конце шага
+    def _rk4_probe(self, state, t_start, dt, num_steps, first):
+        acceleration = self.acceleration
+        planet = self.ephemeris(num_steps + 1, (0.0, 0.5), dt, t_start)
+        compensated = self.low is not None
+        x_sc, y_sc, v_x, v_y = state.tolist()
+        c_x, c_y, c_v_x, c_v_y = self._probe_low()
+
+        for step in range(first + 1, num_steps + 1):
+            t = t_start + (step - 1) * dt
+            start = (x_sc, y_sc, v_x, v_y)
+            half, end = planet[step - 1, 1], planet[step, 0]
+
+            a_x1, a_y1, c1 = acceleration(x_sc, y_sc, t, planet[step - 1, 0])
+            k1_vx, k1_vy = a_x1 * dt, a_y1 * dt
+            k1_x, k1_y = v_x * dt, v_y * dt
+
+            a_x2, a_y2, c2 = acceleration(x_sc + 0.5 * k1_x, y_sc + 0.5 * k1_y, t + 0.5 * dt, half)
+            k2_vx, k2_vy = a_x2 * dt, a_y2 * dt
+            k2_x, k2_y = (v_x + 0.5 * k1_vx) * dt, (v_y + 0.5 * k1_vy) * dt
+
+            a_x3, a_y3, c3 = acceleration(x_sc + 0.5 * k2_x, y_sc + 0.5 * k2_y, t + 0.5 * dt, half)
+            k3_vx, k3_vy = a_x3 * dt, a_y3 * dt
+            k3_x, k3_y = (v_x + 0.5 * k2_vx) * dt, (v_y + 0.5 * k2_vy) * dt
+
+            a_x4, a_y4, c4 = acceleration(x_sc + k3_x, y_sc + k3_y, t + dt, end)
+            k4_vx, k4_vy = a_x4 * dt, a_y4 * dt
+            k4_x, k4_y = (v_x + k3_vx) * dt, (v_y + k3_vy) * dt
+            self.evaluations += 4
+            if c1 or c2 or c3 or c4:
+                self._crashed(t, start, True)
+                break
+
+            d_v_x = (k1_vx + 2 * k2_vx + 2 * k3_vx + k4_vx) / 6
+            d_v_y = (k1_vy + 2 * k2_vy + 2 * k3_vy + k4_vy) / 6
+            d_x = (k1_x + 2 * k2_x + 2 * k3_x + k4_x) / 6
+            d_y = (k1_y + 2 * k2_y + 2 * k3_y + k4_y) / 6
+            if compensated:
+                v_x, c_v_x = compensated_add(v_x, c_v_x, d_v_x)
+                v_y, c_v_y = compensated_add(v_y, c_v_y, d_v_y)
+                x_sc, c_x = compensated_add(x_sc, c_x, d_x)
+                y_sc, c_y = compensated_add(y_sc, c_y, d_y)
+            else:
+                v_x += d_v_x
+                v_y += d_v_y
+                x_sc += d_x
+                y_sc += d_y
+
+            low = (c_x, c_y, c_v_x, c_v_y) if compensated else None
+            if self._finish(step, t, start, t_start + step * dt, (x_sc, y_sc, v_x, v_y), end, low):
+                break
+
+    # Симплектический метод "скачущей лягушки" (velocity Verlet, схема kick-drift-kick).
+    # Одно вычисление силы на шаг: ускорение конца шага переиспользуется на следующем.
+    # При столкновении второго "толчка" нет: записывается состояние после "дрейфа"
+    def leapfrog(self, state, t_start, dt, num_steps, first=0):
+        self._start(state)
+        if self.acceleration is not None:
+            return self._leapfrog_probe(state, t_start, dt, num_steps, first)
+        half = len(state) // 2
+        pos, vel = state[:half], state[half:]
+        low_pos, low_vel = (None, None) if self.low is None else (self.low[:half], self.low[half:])
+        f, crash = self.derivatives(t_start + first * dt, state)
+        self.evaluations += 1
+        self._crashed(t_start + first * dt, state, crash)
+
+        for step in range(first + 1, num_steps + 1):
+            if self.finished:
+                break
+            start = None if self.detector is None else state.copy()
+            self._increment(vel, low_vel, (0.5 * dt) * f[half:])
+            self._increment(pos, low_pos, dt * vel)
+            t = t_start + step * dt
+
+            f, crash = self.derivatives(t, state)
+            self.evaluations += 1
+            if not (self._crashed(t, state, crash) and self.finished):
+                self._increment(vel, low_vel, (0.5 * dt) * f[half:])
+            if self._finish(step, t - dt, start, t, state):
+                break
+
+    # Скалярный leapfrog для одного зонда: планета - в узлах сетки
+    def _leapfrog_probe(self, state, t_start, dt, num_steps, first):
+        acceleration = self.acceleration
+        planet = self.ephemeris(num_steps + 1, (0.0,), dt, t_start)
+        compensated = self.low is not None
+        x_sc, y_sc, v_x, v_y = state.tolist()
+        c_x, c_y, c_v_x, c_v_y = self._probe_low()
+        a_x, a_y, crashed = acceleration(x_sc, y_sc, t_start + first * dt, planet[first, 0])
+        self.evaluations += 1
+        if crashed:
+            self._crashed(t_start + first * dt, state, True)
+
+        for step in range(first + 1, num_steps + 1):
+            if crashed:
+                break
+            start = (x_sc, y_sc, v_x, v_y)
+            if compensated:
+                v_x, c_v_x = compensated_add(v_x, c_v_x, 0.5 * dt * a_x)
+                v_y, c_v_y = compensated_add(v_y, c_v_y, 0.5 * dt * a_y)
+                x_sc, c_x = compensated_add(x_sc, c_x, dt * v_x)
+                y_sc, c_y = compensated_add(y_sc, c_y, dt * v_y)
+            else:
+                v_x += 0.5 * dt * a_x
+                v_y += 0.5 * dt * a_y
+                x_sc += dt * v_x
+                y_sc += dt * v_y
+            t = t_start + step * dt
+            x_p, y_p = planet[step, 0]
+
+            a_x, a_y, crashed = acceleration(x_sc, y_sc, t, (x_p, y_p))
+            self.evaluations += 1
+            if crashed:
+                self._crashed(t, (x_sc, y_sc, v_x, v_y), True)
+            elif compensated:
+                v_x, c_v_x = compensated_add(v_x, c_v_x, 0.5 * dt * a_x)
+                v_y, c_v_y = compensated_add(v_y, c_v_y, 0.5 * dt * a_y)
+            else:
+                v_x += 0.5 * dt * a_x
+                v_y += 0.5 * dt * a_y
+
+            low = (c_x, c_y, c_v_x, c_v_y) if compensated else None
+            if self._finish(step, t - dt, start, t, (x_sc, y_sc, v_x, v_y), (x_p, y_p), low):
+                break
+
+    # Метод Иошиды 4-го порядка: композиция трёх шагов leapfrog (drift-kick-...-drift),
+    # сила на каждой стадии берётся в момент времени, до которого "доехала" координата
+    def yoshida4(self, state, t_start, dt, num_steps, first=0):
+        self._start(state)
+        if self.acceleration is not None:
+            return self._yoshida4_probe(state, t_start, dt, num_steps, first)
+        half = len(state) // 2
+        pos, vel = state[:half], state[half:]
+        low_pos, low_vel = (None, None) if self.low is None else (self.low[:half], self.low[half:])
+
+        for step in range(first + 1, num_steps + 1):
+            start = None if self.detector is None else state.copy()
+            for stage, (c, d) in enumerate(zip(YOSHIDA_C, YOSHIDA_D)):
+                self._increment(pos, low_pos, (c * dt) * vel)
+                t_stage = t_start + (step - 1 + YOSHIDA_OFFSETS[stage]) * dt
+                f, crash = self.derivatives(t_stage, state)
+                self.evaluations += 1
+                if self._crashed(t_stage, state, crash) and self.finished:
+                    break
+                self._increment(vel, low_vel, (d * dt) * f[half:])
+            if self.finished:
+                break
+
+            self._increment(pos, low_pos, (YOSHIDA_C[-1] * dt) * vel)
+            t = t_start + step * dt
+            if self._finish(step, t - dt, start, t, state):
+                break
+
+    # Скалярный метод Иошиды для одного зонда: планета - в моменты YOSHIDA_OFFSETS внутри шага
+    def _yoshida4_probe(self, state, t_start, dt, num_steps, first):
+        acceleration = self.acceleration
+        planet = self.ephemeris(num_steps, YOSHIDA_OFFSETS, dt, t_start)
+        compensated = self.low is not None
+        x_sc, y_sc, v_x, v_y = state.tolist()
+        c_x, c_y, c_v_x, c_v_y = self._probe_low()
+
+        for step in range(first + 1, num_steps + 1):
+            start = (x_sc, y_sc, v_x, v_y)
+            for stage, (c, d) in enumerate(zip(YOSHIDA_C, YOSHIDA_D)):
+                if compensated:
+                    x_sc, c_x = compensated_add(x_sc, c_x, c * dt * v_x)
+                    y_sc, c_y = compensated_add(y_sc, c_y, c * dt * v_y)
+                else:
+                    x_sc += c * dt * v_x
+                    y_sc += c * dt * v_y
+                t_stage = t_start + (step - 1 + YOSHIDA_OFFSETS[stage]) * dt
+                a_x, a_y, crashed = acceleration(x_sc, y_sc, t_stage, planet[step - 1, stage])
+                self.evaluations += 1
+                if crashed:
+                    self._crashed(t_stage, (x_sc, y_sc, v_x, v_y), True)
+                    return
+                if compensated:
+                    v_x, c_v_x = compensated_add(v_x, c_v_x, d * dt * a_x)
+                    v_y, c_v_y = compensated_add(v_y, c_v_y, d * dt * a_y)
+                else:
+                    v_x += d * dt * a_x
+                    v_y += d * dt * a_y
+
+            if compensated:
+                x_sc, c_x = compensated_add(x_sc, c_x, YOSHIDA_C[-1] * dt * v_x)
+                y_sc, c_y = compensated_add(y_sc, c_y, YOSHIDA_C[-1] * dt * v_y)
+            else:
+                x_sc += YOSHIDA_C[-1] * dt * v_x
+                y_sc += YOSHIDA_C[-1] * dt * v_y
+            t = t_start + step * dt
+
+            low = (c_x, c_y, c_v_x, c_v_y) if compensated else None
+            if self._finish(step, t - dt, start, t, (x_sc, y_sc, v_x, v_y), planet[step - 1, 3], low):
+                break
+
+    # Адаптивный метод Дормана-Принса 5(4) с контролем локальной ошибки, записывается каждый принятый шаг.
+    # Если на шаге столкнулось одно из тел, оно замораживается, а шаг пересчитывается уже без него
+    def dopri(self, state, t, t_end, rtol=1e-9, atol=1e-6, h=60, h_max=np.inf, safety=0.9, factor_min=0.2,
+              factor_max=5.0):
+        self._start(state)
+        c_t = 0.0
+        k = np.empty((7, len(state)))
+        k[0], crash = self.derivatives(t, state)
+        self.evaluations += 1
+        if self._crashed(t, state, crash) and self.finished:
+            return
+
+        while t < t_end:
+            h = min(h, h_max, t_end - t)
+
+            crash = False
+            for i in range(1, 7):
+                k[i], stage_crash = self.derivatives(t + DOPRI_C[i] * h, state + h * (DOPRI_A[i, :i] @ k[:i]))
+                crash = crash | stage_crash
+            self.evaluations += 6
+            if self._crashed(t, state, crash):
+                if self.finished:
+                    break
+                k[0] *= self._mask
+                continue
+            if self._mask is not None:
+                k *= self._mask
+
+            increment = h * (DOPRI_B @ k)
+            new_state = state + increment
+            scale = atol + rtol * np.maximum(np.abs(state), np.abs(new_state))
+            error = np.sqrt(np.mean((h * (DOPRI_E @ k) / scale)**2))
+
+            if error <= 1:
+                t0, state0 = t, state
+                if self.compensated:
+                    state, self.low = compensated_add(state, self.low, increment)
+                    t, c_t = compensated_add(t, c_t, h)
+                else:
+                    t += h
+                    state = new_state
+                k[0] = k[6]  # FSAL: последняя стадия совпадает с первой на следующем шаге
+                self.accepted += 1
+                if self._finish(None, t0, state0, t, state):
+                    break
+                factor = factor_max if error == 0 else min(factor_max, safety * error**(-1/5))
+            else:
+                self.rejected += 1
+                factor = max(factor_min, safety * error**(-1/5))
+            h *= factor
@@ -1,8 +1,18 @@
+from functools import lru_cache, partial
+
 import numpy as np
 
+import config
+from checkpoint import Checkpoint, Checkpointer
+from compensated import compensated_add, compensated_add_inplace
 from config import *
+from events import Event, EventDetector
+from instrumentation import record_crash, record_steps
+from integrators import Stepper
+from trajectory import DenseOutput, EnsembleResult, Trajectory
 from visualization import animate_trajectories, draw_graphics
 
+# Энергия зонда; аргументы могут быть как числами, так и массивами траектории целиком
 class Energy:
     def __init__(self, x_sc, y_sc, v_x, v_y, x_p, y_p):
         r_p = np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2)
@@ -13,6 +23,11 @@ class Energy:
         self.potential_energy_star = -G * M_STAR * M_SPACECRAFT / r_s
         self.total_energy = self.kinetic_energy + self.potential_energy_planet + self.potential_energy_star
 
+    # Энергия на всех шагах траектории одним векторным проходом по её массивам
+    @classmethod
+    def from_trajectory(cls, trajectory):
+        return cls(trajectory.x, trajectory.y, trajectory.v_x, trajectory.v_y, trajectory.x_planet, trajectory.y_planet)
+
 
 def move_planet(t):
     x_p = -ORBIT_RADIUS * np.cos(OMEGA * t) + ORBIT_RADIUS
@@ -21,10 +36,158 @@ def move_planet(t):
     return x_p, y_p
 
 
-def planet_acceleration(x_sc, y_sc, x_p, y_p):
+def planet_velocity(t):
+    return ORBIT_RADIUS * OMEGA * np.sin(OMEGA * t), ORBIT_RADIUS * OMEGA * np.cos(OMEGA * t)
+
+
+# Положение и скорость зонда (state = [x, y, v_x, v_y]) относительно планеты в момент t
+def planet_relative(t, state):
+    x_p, y_p = move_planet(t)
+    v_x_p, v_y_p = planet_velocity(t)
+    return state[0] - x_p, state[1] - y_p, state[2] - v_x_p, state[3] - v_y_p
+
+
+def planet_distance(t, state):
+    d_x, d_y, _, _ = planet_relative(t, state)
+    return np.hypot(d_x, d_y)
+
+
+# Стандартные события для интеграторов (параметр events). Касание поверхности - терминальное событие-крушение
+def planet_contact_event(terminal=True):
+    return Event("planet_contact", lambda t, state: planet_distance(t, state) - R_PLANET,
+                 direction=-1, terminal=terminal, crash=terminal)
+
+
+def star_contact_event(terminal=True):
+    return Event("star_contact", lambda t, state: np.hypot(state[0] - X_STAR, state[1] - Y_STAR) - R_STAR,
+                 direction=-1, terminal=terminal, crash=terminal)
+
+
+def contact_events():
+    return [planet_contact_event(), star_contact_event()]
+
+
+# Перицентр пролёта: радиальная скорость относительно планеты меняет знак с "-" на "+"
+def periapsis_event():
+    def radial_velocity(t, state):
+        d_x, d_y, d_v_x, d_v_y = planet_relative(t, state)
+        return d_x * d_v_x + d_y * d_v_y
+    return Event("periapsis", radial_velocity, direction=1, measure=planet_distance)
+
+
+# Вход в сферу действия планеты и выход из неё; по умолчанию радиус Лапласа a * (m / M)^(2/5)
+def sphere_of_influence_events(radius=None, terminal_exit=False):
+    radius = ORBIT_RADIUS * (M_PLANET / M_STAR)**0.4 if radius is None else radius
+    distance = lambda t, state: planet_distance(t, state) - radius
+    return [Event("soi_entry", distance, direction=-1),
+            Event("soi_exit", distance, direction=1, terminal=terminal_exit)]
+
+
+# Проверки столкновения на стадиях отключаются, только если касание ищется событием-крушением
+# (contact_events()); с одними перицентром или сферой действия зонд иначе пролетел бы сквозь планету
+def stage_collisions(events):
+    return events is None or not any(event.crash for event in events)
+
+
+# Общий цикл integrators.Stepper для одного зонда: состояние [x, y, v_x, v_y], строка траектории - состояние,
+# положение планеты и расстояние до неё. save(step, t, state, low) - контрольная точка после шага.
+# Методы фиксированного шага идут скалярным путём Stepper с планетой из PlanetTrack
+def probe_stepper(trajectory, events=None, compensated=False, save=None):
+    collide = stage_collisions(events)
+    detector = None if events is None else EventDetector(events, lambda t, state: derivatives(t, state, collide=False)[0])
+
+    def record(t, state, planet=None):
+        x_sc, y_sc, v_x, v_y = state
+        x_p, y_p = move_planet(t) if planet is None else planet
+        trajectory.append(t, x_sc, y_sc, v_x, v_y, x_p, y_p, np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2))
+
+    def crash(t, state, crashed):
+        trajectory.crashed = True
+
+    # То же, что total_acceleration, но без лишнего вызова на каждой стадии: планета всегда задана
+    def acceleration(x_sc, y_sc, t, planet):
+        a_x_p, a_y_p, r_p = planet_acceleration(x_sc, y_sc, planet[0], planet[1], collide)
+        a_x_s, a_y_s, r_s = star_acceleration(x_sc, y_sc, collide)
+        return a_x_p + a_x_s, a_y_p + a_y_s, collide and (r_p <= R_PLANET or r_s <= R_STAR)
+
+    return Stepper(partial(derivatives, collide=collide), record, crash, detector, compensated, save, acceleration,
+                   PlanetTrack)
+
+
+# Начальное состояние и номер шага: с начала или с контрольной точки resume (вместе с младшими частями)
+def probe_start(x_sc, y_sc, v_x, v_y, stepper, resume=None):
+    if resume is None:
+        return np.array([x_sc, y_sc, v_x, v_y], dtype=np.float64), 0
+    if stepper.compensated:
+        stepper.low = resume.history.copy()
+    return resume.state.copy(), resume.step
+
+
+# Терминальное событие-касание означает крушение, найденные события - в trajectory.stats["events"],
+# число вычислений силы - в trajectory.stats["force_evaluations"]
+def probe_result(trajectory, stepper):
+    trajectory.stats["force_evaluations"] = stepper.evaluations
+    if stepper.event is not None:
+        trajectory.crashed = stepper.event.crash
+    if stepper.detector is not None:
+        trajectory.stats["events"] = stepper.detector.found
+    return trajectory.trim()
+
+
+# Контрольные точки для общего цикла: checkpoint.save на шагах, которые выбирает checkpoint.due
+def checkpoint_saver(checkpoint, method, params, num_steps, trajectory):
+    if checkpoint is None:
+        return None
+
+    def save(step, t, state, low):
+        if checkpoint.due(step, num_steps):
+            checkpoint.save(method, params, num_steps, step, t, state, trajectory, () if low is None else low)
+    return save
+
+
+# Эфемериды планеты: положения в моменты t_start + dt * (k + offset) для k = start..stop-1
+# и каждого смещения offset внутри шага, одним векторным вызовом - массивы формы (stop - start, len(offsets)).
+# Сетки кэшируются, поэтому повторные прогоны на той же сетке не пересчитывают тригонометрию
+def planet_grid(start, stop, offsets=(0.0,), dt=DT, t_start=0):
+    return _planet_grid(start, stop, tuple(offsets), dt, t_start, ORBIT_RADIUS, OMEGA)
+
+
+@lru_cache(maxsize=4)
+def _planet_grid(start, stop, offsets, dt, t_start, orbit_radius, omega):
+    t = t_start + dt * (np.arange(start, stop)[:, None] + np.array(offsets))
+    x_p, y_p = move_planet(t)
+    x_p.flags.writeable = False
+    y_p.flags.writeable = False
+
+    return x_p, y_p
+
+
+EPHEMERIS_BLOCK = 65536                     # Шагов в одном блоке эфемерид
+
+# Доступ к эфемеридам по номеру шага: track[step, k] - положение планеты (x_p, y_p) в момент
+# t_start + dt * (step + offsets[k]). Сетка вычисляется блоками, поэтому память не растёт с числом шагов
+class PlanetTrack:
+    def __init__(self, num_rows, offsets=(0.0,), dt=DT, t_start=0):
+        self.num_rows = num_rows
+        self.offsets = tuple(offsets)
+        self.dt = dt
+        self.t_start = t_start
+        self._start = self._stop = 0
+
+    def __getitem__(self, key):
+        step, k = key
+        if not self._start <= step < self._stop:
+            self._start = step - step % EPHEMERIS_BLOCK
+            self._stop = min(self._start + EPHEMERIS_BLOCK, self.num_rows)
+            self._x, self._y = planet_grid(self._start, self._stop, self.offsets, self.dt, self.t_start)
+        return self._x[step - self._start, k], self._y[step - self._start, k]
+
+
+# collide=False - чистое поле точечной массы без проверки столкновения (когда касание ищется событиями)
+def planet_acceleration(x_sc, y_sc, x_p, y_p, collide=True):
     r = np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2)
-    if r <= R_PLANET:
-        print("Crash! The spacecraft has collided with the planet.")
+    if collide and r <= R_PLANET:
+        record_crash("planet", x_sc, y_sc, r)
         return 0, 0, r
     
     a_x = -G * M_PLANET * (x_sc - x_p) / r**3
@@ -33,302 +196,508 @@ def planet_acceleration(x_sc, y_sc, x_p, y_p):
     return a_x, a_y, r
 
 
-def star_acceleration(x_sc, y_sc):
+def star_acceleration(x_sc, y_sc, collide=True):
     r = np.sqrt((x_sc-X_STAR)**2 + (y_sc - Y_STAR)**2)
-    if r <= R_STAR:
-        print("Crash! The spacecraft has collided with the star.")
-        return 0, 0
+    if collide and r <= R_STAR:
+        record_crash("star", x_sc, y_sc, r)
+        return 0, 0, r
 
     a_x = -G * M_STAR * (x_sc - X_STAR) / r**3
     a_y = -G * M_STAR * (y_sc - Y_STAR) / r**3
 
-    return a_x, a_y
-
-
-def euler_method(x_sc, y_sc, x_p, y_p, v_x, v_y):
-    x_trajectory, y_trajectory = [], []
-    x_planet_trajectory, y_planet_trajectory = [], []
-    speed, distance = [], []
-    t=0
-    for _ in range(NUM_STEPS):
-        a_x_p, a_y_p, r_p = planet_acceleration(x_sc, y_sc, x_p, y_p)
-        a_x_s, a_y_s = star_acceleration(x_sc, y_sc)
-        if a_x_s == 0 or a_x_p == 0:
-            break
-        a_x = a_x_s + a_x_p
-        a_y = a_y_s + a_y_p
-        
-        v_x += a_x * DT
-        v_y += a_y * DT
-        
-        x_sc += v_x * DT
-        y_sc += v_y * DT
-        x_p, y_p = move_planet(t)
-        
-        x_trajectory.append(x_sc)
-        y_trajectory.append(y_sc)
-        x_planet_trajectory.append(x_p)
-        y_planet_trajectory.append(y_p)
-        
-        speed.append(np.sqrt(v_x**2 + v_y**2))
-        distance.append(r_p)
-        t+=DT
+    return a_x, a_y, r
 
-    return x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance     
 
-def rk4_method(x_sc, y_sc, x_p, y_p, v_x, v_y):
-    x_trajectory, y_trajectory = [], []
-    x_planet_trajectory, y_planet_trajectory = [], []
-    speed, distance, energy = [], [], []
-    t = 0
-    
-    for _ in range(NUM_STEPS):
-        # Вычисляем ускорение в начальной точке (K1)
-        a_x_p1, a_y_p1, r_p = planet_acceleration(x_sc, y_sc, x_p, y_p)
-        a_x_s1, a_y_s1 = star_acceleration(x_sc, y_sc)
-        if a_x_p1 == 0 or a_x_s1 == 0:
-            break  # Остановка при столкновении
-        a_x1 = a_x_p1 + a_x_s1
-        a_y1 = a_y_p1 + a_y_s1
-        
-        k1_vx, k1_vy = a_x1 * DT, a_y1 * DT
-        k1_x, k1_y = v_x * DT, v_y * DT
+# Векторные версии ядер для ансамбля зондов: положения - массивы формы (2, N).
+# Вместо печати и нулевого ускорения возвращают маску столкнувшихся зондов
+def planet_acceleration_batch(pos, x_p, y_p):
+    d = pos - np.vstack((x_p, y_p))
+    r2 = np.einsum('ij,ij->j', d, d)
+    r = np.sqrt(r2)
 
-        # K2 (половина шага)
-        a_x_p2, a_y_p2, _ = planet_acceleration(x_sc + 0.5 * k1_x, y_sc + 0.5 * k1_y, x_p, y_p)
-        a_x_s2, a_y_s2 = star_acceleration(x_sc + 0.5 * k1_x, y_sc + 0.5 * k1_y)
-        if a_x_p2 == 0 or a_x_s2 == 0:
-            break  # Остановка при столкновении
-        a_x2 = a_x_p2 + a_x_s2
-        a_y2 = a_y_p2 + a_y_s2
-        
-        k2_vx, k2_vy = a_x2 * DT, a_y2 * DT
-        k2_x, k2_y = (v_x + 0.5 * k1_vx) * DT, (v_y + 0.5 * k1_vy) * DT
+    return d * (-G * M_PLANET / (r2 * r)), r, r <= R_PLANET
 
-        # K3 (ещё одна половина шага)
-        a_x_p3, a_y_p3, _ = planet_acceleration(x_sc + 0.5 * k2_x, y_sc + 0.5 * k2_y, x_p, y_p)
-        a_x_s3, a_y_s3 = star_acceleration(x_sc + 0.5 * k2_x, y_sc + 0.5 * k2_y)
-        if a_x_p3 == 0 or a_x_s3 == 0:
-            break  # Остановка при столкновении
-        a_x3 = a_x_p3 + a_x_s3
-        a_y3 = a_y_p3 + a_y_s3
-        
-        k3_vx, k3_vy = a_x3 * DT, a_y3 * DT
-        k3_x, k3_y = (v_x + 0.5 * k2_vx) * DT, (v_y + 0.5 * k2_vy) * DT
 
-        # K4 (полный шаг)
-        a_x_p4, a_y_p4, _ = planet_acceleration(x_sc + k3_x, y_sc + k3_y, x_p, y_p)
-        a_x_s4, a_y_s4 = star_acceleration(x_sc + k3_x, y_sc + k3_y)
-        if a_x_p4 == 0 or a_x_s4 == 0:
-            break  # Остановка при столкновении
-        a_x4 = a_x_p4 + a_x_s4
-        a_y4 = a_y_p4 + a_y_s4
-        
-        k4_vx, k4_vy = a_x4 * DT, a_y4 * DT
-        k4_x, k4_y = (v_x + k3_vx) * DT, (v_y + k3_vy) * DT
+def star_acceleration_batch(pos):
+    d = pos - np.array([[X_STAR], [Y_STAR]])
+    r2 = np.einsum('ij,ij->j', d, d)
 
-        # Обновляем скорость спутника
-        v_x += (k1_vx + 2 * k2_vx + 2 * k3_vx + k4_vx) / 6
-        v_y += (k1_vy + 2 * k2_vy + 2 * k3_vy + k4_vy) / 6
-        
-        # Обновляем координаты спутника
-        x_sc += (k1_x + 2 * k2_x + 2 * k3_x + k4_x) / 6
-        y_sc += (k1_y + 2 * k2_y + 2 * k3_y + k4_y) / 6
-
-        x_p, y_p = move_planet(t)
-
-        # Сохраняем данные для визуализации
-        x_trajectory.append(x_sc)
-        y_trajectory.append(y_sc)
-        x_planet_trajectory.append(x_p)
-        y_planet_trajectory.append(y_p)
-        speed.append(np.sqrt(v_x**2 + v_y**2))
-        energy.append(Energy(x_sc, y_sc, v_x, v_y, x_p, y_p))
-        distance.append(np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2))
-        t += DT
-
-    return x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance, energy
-
-def adams_bashforth_method(x_sc, y_sc, x_p, y_p, v_x, v_y):
-    x_trajectory, y_trajectory = [], []
-    x_planet_trajectory, y_planet_trajectory = [], []
-    speed, distance = [], []
-    t = 0
-
-    # Начальная инициализация с использованием метода Рунге-Кутты 4-го порядка
-    rk4_steps = 4
-    for _ in range(rk4_steps):
-        a_x_p1, a_y_p1, r_p = planet_acceleration(x_sc, y_sc, x_p, y_p)
-        a_x_s1, a_y_s1 = star_acceleration(x_sc, y_sc)
-        if a_x_p1 == 0 or a_x_s1 == 0:
-            break  # Остановка при столкновении
-        a_x1 = a_x_p1 + a_x_s1
-        a_y1 = a_y_p1 + a_y_s1
-        
-        k1_vx, k1_vy = a_x1 * DT, a_y1 * DT
-        k1_x, k1_y = v_x * DT, v_y * DT
+    return d * (-G * M_STAR / (r2 * np.sqrt(r2))), r2 <= R_STAR**2
 
-        a_x_p2, a_y_p2, _ = planet_acceleration(x_sc + 0.5 * k1_x, y_sc + 0.5 * k1_y, x_p, y_p)
-        a_x_s2, a_y_s2 = star_acceleration(x_sc + 0.5 * k1_x, y_sc + 0.5 * k1_y)
-        if a_x_p2 == 0 or a_x_s2 == 0:
-            break  # Остановка при столкновении
-        a_x2 = a_x_p2 + a_x_s2
-        a_y2 = a_y_p2 + a_y_s2
-        
-        k2_vx, k2_vy = a_x2 * DT, a_y2 * DT
-        k2_x, k2_y = (v_x + 0.5 * k1_vx) * DT, (v_y + 0.5 * k1_vy) * DT
 
-        a_x_p3, a_y_p3, _ = planet_acceleration(x_sc + 0.5 * k2_x, y_sc + 0.5 * k2_y, x_p, y_p)
-        a_x_s3, a_y_s3 = star_acceleration(x_sc + 0.5 * k2_x, y_sc + 0.5 * k2_y)
-        if a_x_p3 == 0 or a_x_s3 == 0:
-            break  # Остановка при столкновении
-        a_x3 = a_x_p3 + a_x_s3
-        a_y3 = a_y_p3 + a_y_s3
-        
-        k3_vx, k3_vy = a_x3 * DT, a_y3 * DT
-        k3_x, k3_y = (v_x + 0.5 * k2_vx) * DT, (v_y + 0.5 * k2_vy) * DT
+def total_acceleration_batch(pos, t):
+    x_p, y_p = move_planet(t)
+    a_p, r_p, crash_p = planet_acceleration_batch(pos, x_p, y_p)
+    a_s, crash_s = star_acceleration_batch(pos)
+    a_p += a_s
 
-        a_x_p4, a_y_p4, _ = planet_acceleration(x_sc + k3_x, y_sc + k3_y, x_p, y_p)
-        a_x_s4, a_y_s4 = star_acceleration(x_sc + k3_x, y_sc + k3_y)
-        if a_x_p4 == 0 or a_x_s4 == 0:
-            break  # Остановка при столкновении
-        a_x4 = a_x_p4 + a_x_s4
-        a_y4 = a_y_p4 + a_y_s4
-        
-        k4_vx, k4_vy = a_x4 * DT, a_y4 * DT
-        k4_x, k4_y = (v_x + k3_vx) * DT, (v_y + k3_vy) * DT
+    return a_p, r_p, crash_p | crash_s
 
-        v_x += (k1_vx + 2 * k2_vx + 2 * k3_vx + k4_vx) / 6
-        v_y += (k1_vy + 2 * k2_vy + 2 * k3_vy + k4_vy) / 6
-        
-        x_sc += (k1_x + 2 * k2_x + 2 * k3_x + k4_x) / 6
-        y_sc += (k1_y + 2 * k2_y + 2 * k3_y + k4_y) / 6
 
-        x_p, y_p = move_planet(t)
+# Плотный вывод для траектории любого метода: ускорения в сохранённых узлах считаются по той же модели сил
+def dense_output(trajectory):
+    return DenseOutput(trajectory, lambda t, pos: total_acceleration_batch(pos, t)[0], move_planet)
 
-        x_trajectory.append(x_sc)
-        y_trajectory.append(y_sc)
-        x_planet_trajectory.append(x_p)
-        y_planet_trajectory.append(y_p)
-        speed.append(np.sqrt(v_x**2 + v_y**2))
-        distance.append(np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2))
-        t += DT
 
-    # Используем метод Адамса-Башфорта 4-го порядка
-    for _ in range(NUM_STEPS - rk4_steps):
+# Положение планеты берётся из эфемерид, x_p и y_p оставлены для совместимости вызовов.
+# compensated - состояние и время накапливаются компенсированным суммированием
+def euler_method(x_sc, y_sc, x_p, y_p, v_x, v_y, trajectory=None, compensated=False):
+    trajectory = Trajectory(NUM_STEPS) if trajectory is None else trajectory
+    planet = PlanetTrack(NUM_STEPS + 1, dt=DT)
+    t=0
+    c_x = c_y = c_v_x = c_v_y = c_t = 0.0
+    for step in range(NUM_STEPS):
+        x_p, y_p = planet[step, 0]
         a_x_p, a_y_p, r_p = planet_acceleration(x_sc, y_sc, x_p, y_p)
-        a_x_s, a_y_s = star_acceleration(x_sc, y_sc)
-        if a_x_p == 0 or a_x_s == 0:
-            break  # Остановка при столкновении
-        a_x = a_x_p + a_x_s
-        a_y = a_y_p + a_y_s
-
-        # Используем предыдущие значения ускорений для метода Адамса-Башфорта
-        a_x_prev = [a_x1, a_x2, a_x3, a_x4]
-        a_y_prev = [a_y1, a_y2, a_y3, a_y4]
-
-        v_x += DT * (55 * a_x_prev[-1] - 59 * a_x_prev[-2] + 37 * a_x_prev[-3] - 9 * a_x_prev[-4]) / 24
-        v_y += DT * (55 * a_y_prev[-1] - 59 * a_y_prev[-2] + 37 * a_y_prev[-3] - 9 * a_y_prev[-4]) / 24
-
-        x_sc += v_x * DT
-        y_sc += v_y * DT
-
-        x_p, y_p = move_planet(t)
-
-        x_trajectory.append(x_sc)
-        y_trajectory.append(y_sc)
-        x_planet_trajectory.append(x_p)
-        y_planet_trajectory.append(y_p)
-        speed.append(np.sqrt(v_x**2 + v_y**2))
-        distance.append(np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2))
-        t += DT
-
-        a_x1, a_x2, a_x3, a_x4 = a_x2, a_x3, a_x4, a_x
-        a_y1, a_y2, a_y3, a_y4 = a_y2, a_y3, a_y4, a_y
+        a_x_s, a_y_s, r_s = star_acceleration(x_sc, y_sc)
+        if r_p <= R_PLANET or r_s <= R_STAR:
+            trajectory.crashed = True
+            break
+        a_x = a_x_s + a_x_p
+        a_y = a_y_s + a_y_p
+        
+        if compensated:
+            v_x, c_v_x = compensated_add(v_x, c_v_x, a_x * DT)
+            v_y, c_v_y = compensated_add(v_y, c_v_y, a_y * DT)
+            x_sc, c_x = compensated_add(x_sc, c_x, v_x * DT)
+            y_sc, c_y = compensated_add(y_sc, c_y, v_y * DT)
+            t, c_t = compensated_add(t, c_t, DT)
+        else:
+            v_x += a_x * DT
+            v_y += a_y * DT
+
+            x_sc += v_x * DT
+            y_sc += v_y * DT
+            t+=DT
+        x_p, y_p = planet[step + 1, 0]
+        
+        trajectory.append(t, x_sc, y_sc, v_x, v_y, x_p, y_p, np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2))
+
+    return trajectory.trim()
+
+# Метод Рунге-Кутты 4-го порядка (integrators.Stepper.rk4), планета на стадиях - из сетки эфемерид (PlanetTrack).
+# checkpoint - Checkpointer для периодических контрольных точек, resume - Checkpoint, с которого продолжить.
+# events - список Event: события уточняются внутри шага. Если среди них есть касание (contact_events()),
+# столкновения задаются им, а не проверкой стадий. Найденные события - в trajectory.stats["events"].
+# compensated - накапливать состояние компенсированным суммированием (младшие части - в контрольной точке)
+def rk4_method(x_sc, y_sc, x_p, y_p, v_x, v_y, trajectory=None, num_steps=NUM_STEPS, checkpoint=None, resume=None,
+               events=None, compensated=False):
+    params = {"x_sc": x_sc, "y_sc": y_sc, "x_p": x_p, "y_p": y_p, "v_x": v_x, "v_y": v_y, "compensated": compensated}
+    trajectory = Trajectory(num_steps) if trajectory is None else trajectory
+    stepper = probe_stepper(trajectory, events, compensated,
+                            checkpoint_saver(checkpoint, "rk4", params, num_steps, trajectory))
+    state, first = probe_start(x_sc, y_sc, v_x, v_y, stepper, resume)
+
+    stepper.rk4(state, 0, DT, num_steps, first)
+    return probe_result(trajectory, stepper)
+
+# Пакетный метод Рунге-Кутты 4-го порядка: состояние - массив (N, 4) из x, y, v_x, v_y.
+# Столкнувшийся зонд замораживается и запоминает свой шаг крушения, остальные летят дальше.
+# t_start может быть массивом (N,) - тогда у каждого зонда своя фаза планеты.
+# compensated - компенсированное суммирование позиций, скоростей и времени (младшие части - такие же массивы)
+def rk4_ensemble_method(state, t_start=0, num_steps=NUM_STEPS, compensated=False):
+    state = np.array(state, dtype=np.float64).reshape(-1, 4)
+    pos = np.ascontiguousarray(state[:, :2].T)
+    vel = np.ascontiguousarray(state[:, 2:].T)
+    crash_step = np.full(len(state), -1)
+    min_distance = np.full(len(state), np.inf)
+    active = None
+    t = t_start
+    if compensated:
+        c_pos, c_vel, c_t = np.zeros_like(pos), np.zeros_like(vel), 0.0
+
+    for step in range(num_steps):
+        # Положение планеты берём в моменты времени соответствующих стадий
+        a1, r_p, crash1 = total_acceleration_batch(pos, t)
+        np.minimum(min_distance, r_p, out=min_distance)
+
+        a2, _, crash2 = total_acceleration_batch(pos + (0.5 * DT) * vel, t + 0.5 * DT)
+        v2 = vel + (0.5 * DT) * a1
+
+        a3, _, crash3 = total_acceleration_batch(pos + (0.5 * DT) * v2, t + 0.5 * DT)
+        v3 = vel + (0.5 * DT) * a2
+
+        a4, _, crash4 = total_acceleration_batch(pos + DT * v3, t + DT)
+        v4 = vel + DT * a3
+
+        # Фиксируем шаг крушения для зондов, столкнувшихся на любой из стадий
+        crashed = crash1 | crash2 | crash3 | crash4
+        if active is not None:
+            crashed &= active
+        if crashed.any():
+            crash_step[crashed] = step
+            active = ~crashed if active is None else active & ~crashed
+            if not active.any():
+                break
 
-    return x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance
+        d_pos = (vel + 2 * v2 + 2 * v3 + v4) * (DT / 6)
+        d_vel = (a1 + 2 * a2 + 2 * a3 + a4) * (DT / 6)
+        if active is not None:
+            d_pos *= active
+            d_vel *= active
+        if compensated:
+            compensated_add_inplace(pos, c_pos, d_pos)
+            compensated_add_inplace(vel, c_vel, d_vel)
+            t, c_t = compensated_add(t, c_t, DT)
+        else:
+            pos += d_pos
+            vel += d_vel
+            t = t + DT
+
+    # Прерванный цикл (все зонды столкнулись) успел сделать step шагов
+    record_steps(num_steps if active is None or active.any() else step)
+    return EnsembleResult(np.vstack((pos, vel)).T, t, crash_step, min_distance)
+
+# Коэффициенты Адамса-Башфорта (предиктор) и Адамса-Мултона (корректор) 4-го порядка,
+# от самой старой производной к самой новой. Для кольцевого буфера храним все 4 сдвига
+AB4_WEIGHTS = [np.roll(np.array([-9, 37, -59, 55]) / 24, k) for k in range(4)]
+AM4_WEIGHTS = [np.roll(np.array([0, 1, -5, 19]) / 24, k) for k in range(4)]
+AM4_NEW_WEIGHT = 9 / 24
+
+
+# Многошаговый метод Адамса-Башфорта-Мултона 4-го порядка.
+# История - кольцевой буфер производных состояния (v_x, v_y, a_x, a_y) в четырёх последних узлах сетки,
+# разгон - три шага Рунге-Кутты. Без корректора - одно вычисление силы на шаг (PE), с корректором - два (PECE).
+# compensated - приращения состояния складываются компенсированным суммированием, младшие части хранятся
+# в контрольной точке рядом с буфером. Время считается по номеру шага, компенсировать его не нужно
+def adams_bashforth_method(x_sc, y_sc, x_p, y_p, v_x, v_y, corrector=False, trajectory=None, num_steps=NUM_STEPS,
+                           checkpoint=None, resume=None, compensated=False):
+    params = {"x_sc": x_sc, "y_sc": y_sc, "x_p": x_p, "y_p": y_p, "v_x": v_x, "v_y": v_y, "corrector": corrector,
+              "compensated": compensated}
+    trajectory = Trajectory(num_steps) if trajectory is None else trajectory
+    h = DT
+    planet = PlanetTrack(num_steps + 1, (0.0, 0.5), DT)
+
+    if resume is None:
+        state = np.array([x_sc, y_sc, v_x, v_y], dtype=np.float64)
+        low = np.zeros(4)
+        history = np.empty((4, 4))
+        head = 3  # индекс самой старой (вытесняемой) производной в буфере
+        first = 1
+        # Разгон методом Рунге-Кутты 4-го порядка: k1 каждого шага - производная в узле сетки
+        f, crashed = derivatives(0, state, planet[0, 0])
+        evaluations = 1
+    else:
+        # В контрольной точке вместе с буфером хранятся производная в текущем узле и младшие части состояния
+        state = resume.state.copy()
+        history, f = resume.history[:4].copy(), resume.history[4].copy()
+        low = resume.history[5].copy() if len(resume.history) > 5 else np.zeros(4)
+        head, evaluations = resume.counters["head"], resume.counters["force_evaluations"]
+        crashed = resume.counters["crashed"]
+        first = resume.step + 1
+
+    for step in range(first, num_steps + 1):
+        if crashed:
+            trajectory.crashed = True
+            break  # Остановка при столкновении
+        t = (step - 1) * h
+        half = planet[step - 1, 1]
+        end = planet[step, 0]
+
+        if step <= 3:
+            history[step - 1] = f
+            k2, crash2 = derivatives(t + 0.5 * h, state + 0.5 * h * f, half)
+            k3, crash3 = derivatives(t + 0.5 * h, state + 0.5 * h * k2, half)
+            k4, crash4 = derivatives(t + h, state + h * k3, end)
+            evaluations += 3
+            if crash2 or crash3 or crash4:
+                trajectory.crashed = True
+                break  # Остановка при столкновении
+            increment = h * (f + 2 * k2 + 2 * k3 + k4) / 6
+            if compensated:
+                state, low = compensated_add(state, low, increment)
+            else:
+                state = state + increment
+            f, crashed = derivatives(t + h, state, end)
+            evaluations += 1
+        else:
+            # Самая старая производная вытесняется новой
+            history[head] = f
+            head = (head + 1) % 4
+            if compensated:
+                predicted, predicted_low = compensated_add(state, low, h * (AB4_WEIGHTS[head] @ history))
+            else:
+                predicted, predicted_low = state + h * (AB4_WEIGHTS[head] @ history), low
+            f, crashed = derivatives(t + h, predicted, end)
+            evaluations += 1
+            if corrector and not crashed:
+                # Корректор тоже стартует от state: предсказание нужно только для производной
+                increment = h * (AM4_WEIGHTS[head] @ history + AM4_NEW_WEIGHT * f)
+                if compensated:
+                    state, low = compensated_add(state, low, increment)
+                else:
+                    state = state + increment
+                f, crashed = derivatives(t + h, state, end)
+                evaluations += 1
+            else:
+                state, low = predicted, predicted_low
 
-def total_acceleration(x_sc, y_sc, t):
-    x_p, y_p = move_planet(t)
-    a_x_p, a_y_p, _ = planet_acceleration(x_sc, y_sc, x_p, y_p)
-    a_x_s, a_y_s = star_acceleration(x_sc, y_sc)
-    if a_x_p == 0 or a_x_s == 0:  # Проверка на столкновение
-        return 0, 0
-    return a_x_p + a_x_s, a_y_p + a_y_s
-
-# Неявный метод трапеций
-def trapezoidal_method(x_sc, y_sc, v_x, v_y, t_start=0, max_iterations=10, tolerance=1e-6):
-    x_trajectory, y_trajectory = [x_sc], [y_sc]
-    speed, distance = [np.sqrt(v_x**2 + v_y**2)], [INITIAL_DISTANCE]
+        t += h
+        x_p, y_p = end
+        trajectory.append(t, *state, x_p, y_p, np.sqrt((state[0] - x_p)**2 + (state[1] - y_p)**2))
+
+        if checkpoint is not None and checkpoint.due(step, num_steps):
+            checkpoint.save("adams_bashforth", params, num_steps, step, t, state, trajectory, np.vstack((history, f, low)),
+                            {"head": head, "force_evaluations": evaluations, "crashed": bool(crashed)})
+
+    trajectory.stats = {"force_evaluations": evaluations}
+    return trajectory.trim()
+
+# planet - заранее известное положение планеты в момент t (например, из PlanetTrack).
+# Возвращает ускорение и признак столкновения: при столкновении ускорение не имеет смысла
+def total_acceleration(x_sc, y_sc, t, planet=None, collide=True):
+    x_p, y_p = move_planet(t) if planet is None else planet
+    a_x_p, a_y_p, r_p = planet_acceleration(x_sc, y_sc, x_p, y_p, collide)
+    a_x_s, a_y_s, r_s = star_acceleration(x_sc, y_sc, collide)
+    crashed = collide and (r_p <= R_PLANET or r_s <= R_STAR)
+    return a_x_p + a_x_s, a_y_p + a_y_s, crashed
+
+
+# Производная вектора состояния [x, y, v_x, v_y] и признак столкновения
+def derivatives(t, state, planet=None, collide=True):
+    a_x, a_y, crashed = total_acceleration(state[0], state[1], t, planet, collide)
+    return np.array([state[2], state[3], a_x, a_y]), crashed
+
+
+# Адаптивный метод Дормана-Принса 5(4) с контролем локальной ошибки (integrators.Stepper.dopri).
+# Положение планеты вычисляется на каждой стадии в её собственный момент времени.
+# compensated - принятые шаги прибавляются к состоянию и времени компенсированным суммированием
+def dopri_method(x_sc, y_sc, v_x, v_y, t_start=0, t_end=NUM_STEPS * DT, rtol=1e-9, atol=1e-6,
+                 h=DT, h_max=np.inf, safety=0.9, factor_min=0.2, factor_max=5.0, trajectory=None, events=None,
+                 compensated=False):
+    trajectory = Trajectory(1024) if trajectory is None else trajectory
+    stepper = probe_stepper(trajectory, events, compensated)
+    state = np.array([x_sc, y_sc, v_x, v_y], dtype=np.float64)
+    stepper.record(t_start, state)
+
+    stepper.dopri(state, t_start, t_end, rtol, atol, h, h_max, safety, factor_min, factor_max)
+    trajectory.stats = {"accepted_steps": stepper.accepted, "rejected_steps": stepper.rejected}
+    return probe_result(trajectory, stepper)
+
+# Симплектический метод "скачущей лягушки" (integrators.Stepper.leapfrog), одно вычисление силы на шаг.
+# Ускорение в текущем узле однозначно определяется состоянием, поэтому в контрольной точке не хранится.
+# compensated - "толчки" и "дрейфы" складываются компенсированным суммированием
+def leapfrog_method(x_sc, y_sc, v_x, v_y, t_start=0, dt=DT, num_steps=NUM_STEPS, trajectory=None,
+                    checkpoint=None, resume=None, events=None, compensated=False):
+    params = {"x_sc": x_sc, "y_sc": y_sc, "v_x": v_x, "v_y": v_y, "t_start": t_start, "dt": dt,
+              "compensated": compensated}
+    trajectory = Trajectory(num_steps) if trajectory is None else trajectory
+    stepper = probe_stepper(trajectory, events, compensated,
+                            checkpoint_saver(checkpoint, "leapfrog", params, num_steps, trajectory))
+    state, first = probe_start(x_sc, y_sc, v_x, v_y, stepper, resume)
+
+    stepper.leapfrog(state, t_start, dt, num_steps, first)
+    return probe_result(trajectory, stepper)
+
+
+# Метод Иошиды 4-го порядка (integrators.Stepper.yoshida4): композиция трёх шагов leapfrog,
+# планета берётся в момент времени, до которого "доехала" координата. compensated - как в leapfrog_method
+def yoshida4_method(x_sc, y_sc, v_x, v_y, t_start=0, dt=DT, num_steps=NUM_STEPS, trajectory=None, events=None,
+                    compensated=False):
+    trajectory = Trajectory(num_steps) if trajectory is None else trajectory
+    stepper = probe_stepper(trajectory, events, compensated)
+    state, _ = probe_start(x_sc, y_sc, v_x, v_y, stepper)
+
+    stepper.yoshida4(state, t_start, dt, num_steps)
+    return probe_result(trajectory, stepper)
+
+# Ускорение от точечной массы и его якобиан (тензор градиента поля):
+# da/dr = -mu / r^3 * (I - 3 d d^T / r^2)
+def point_mass_field(dx, dy, mu):
+    r2 = dx**2 + dy**2
+    k = mu / (r2 * np.sqrt(r2))
+    q = 3 / r2
+
+    return -k * dx, -k * dy, -k * (1 - q * dx**2), k * q * dx * dy, -k * (1 - q * dy**2)
+
+
+def gravity_field(x_sc, y_sc, x_p, y_p):
+    dx_p, dy_p = x_sc - x_p, y_sc - y_p
+    dx_s, dy_s = x_sc - X_STAR, y_sc - Y_STAR
+    if dx_p**2 + dy_p**2 <= R_PLANET**2 or dx_s**2 + dy_s**2 <= R_STAR**2:
+        return None  # Столкновение
+
+    a_x_p, a_y_p, g_xx_p, g_xy_p, g_yy_p = point_mass_field(dx_p, dy_p, G * M_PLANET)
+    a_x_s, a_y_s, g_xx_s, g_xy_s, g_yy_s = point_mass_field(dx_s, dy_s, G * M_STAR)
+
+    return a_x_p + a_x_s, a_y_p + a_y_s, g_xx_p + g_xx_s, g_xy_p + g_xy_s, g_yy_p + g_yy_s
+
+
+# Неявный метод трапеций, неявное уравнение решается методом Ньютона.
+# Подставив v_{n+1} в уравнение для координат, получаем систему только на приращение координат d = x_{n+1} - x_n:
+# R(d) = d - h v_n - h^2/4 (a_n + a(x_n + d, t_{n+1})) = 0,  J = I - h^2/4 da/dx.
+# Неизвестное - приращение, а не сама координата: иначе решение Ньютона уже округлено до точности координаты,
+# и compensated (компенсированное суммирование координат и скоростей) было бы нечего сохранять
+def trapezoidal_method(x_sc, y_sc, v_x, v_y, t_start=0, max_iterations=10, tolerance=1e-12, trajectory=None,
+                       compensated=False):
+    trajectory = Trajectory(NUM_STEPS + 1) if trajectory is None else trajectory
+    h = DT
+    c = h**2 / 4
     t = t_start
+    c_x = c_y = c_v_x = c_v_y = 0.0
+    iterations, failures = 0, 0
+    planet = PlanetTrack(NUM_STEPS + 1, dt=h, t_start=t_start)
+
+    x_p, y_p = planet[0, 0]
+    trajectory.append(t, x_sc, y_sc, v_x, v_y, x_p, y_p, np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2))
+    # f(t_n, y_n) вычисляется один раз и переходит на следующий шаг
+    field = gravity_field(x_sc, y_sc, x_p, y_p)
+    evaluations = 1
+
+    for step in range(1, NUM_STEPS + 1):
+        if field is None:
+            trajectory.crashed = True
+            break  # Остановка при столкновении
+        a_x, a_y = field[0], field[1]
+        t = t_start + step * h
+        x_p, y_p = planet[step, 0]
 
-    for _ in range(NUM_STEPS):
-        h = DT
-        # Начальное приближение для y_{n+1} (метод Эйлера)
-        x_next = x_sc + h * v_x
-        y_next = y_sc + h * v_y
-        v_x_next = v_x + h * total_acceleration(x_sc, y_sc, t)[0]
-        v_y_next = v_y + h * total_acceleration(x_sc, y_sc, t)[1]
+        # Начальное приближение - явный шаг по формуле Тейлора
+        d_x = h * v_x + 2 * c * a_x
+        d_y = h * v_y + 2 * c * a_y
+        base_x = h * v_x + c * a_x
+        base_y = h * v_y + c * a_y
 
-        # Итерации для решения неявного уравнения
         for _ in range(max_iterations):
-            a_x_next, a_y_next = total_acceleration(x_next, y_next, t + h)
-            if a_x_next == 0:  # Столкновение
+            field = gravity_field(x_sc + d_x, y_sc + d_y, x_p, y_p)
+            evaluations += 1
+            iterations += 1
+            if field is None:
                 break
-
-            x_new = x_sc + (h / 2) * (v_x + v_x_next)
-            y_new = y_sc + (h / 2) * (v_y + v_y_next)
-            v_x_new = v_x + (h / 2) * (total_acceleration(x_sc, y_sc, t)[0] + a_x_next)
-            v_y_new = v_y + (h / 2) * (total_acceleration(x_sc, y_sc, t)[1] + a_y_next)
-
-            # Проверка сходимости
-            if (np.abs(x_new - x_next) < tolerance and
-                np.abs(y_new - y_next) < tolerance and
-                np.abs(v_x_new - v_x_next) < tolerance and
-                np.abs(v_y_new - v_y_next) < tolerance):
-                x_next, y_next, v_x_next, v_y_next = x_new, y_new, v_x_new, v_y_new
+            a_x_next, a_y_next, g_xx, g_xy, g_yy = field
+
+            r_x = d_x - base_x - c * a_x_next
+            r_y = d_y - base_y - c * a_y_next
+            j_xx, j_xy, j_yy = 1 - c * g_xx, -c * g_xy, 1 - c * g_yy
+            det = j_xx * j_yy - j_xy**2
+            dx = (j_yy * r_x - j_xy * r_y) / det
+            dy = (j_xx * r_y - j_xy * r_x) / det
+            d_x -= dx
+            d_y -= dy
+
+            # Проверка сходимости по относительной поправке координат
+            if np.sqrt(dx**2 + dy**2) <= tolerance * np.sqrt((x_sc + d_x)**2 + (y_sc + d_y)**2):
                 break
-            x_next, y_next, v_x_next, v_y_next = x_new, y_new, v_x_new, v_y_new
+        else:
+            failures += 1
 
-        if a_x_next == 0:  # Прерывание при столкновении
-            break
+        if field is not None:
+            field = gravity_field(x_sc + d_x, y_sc + d_y, x_p, y_p)
+            evaluations += 1
+        if field is None:
+            trajectory.crashed = True
+            break  # Прерывание при столкновении
 
         # Обновление текущего состояния
-        x_sc, y_sc, v_x, v_y = x_next, y_next, v_x_next, v_y_next
-        x_trajectory.append(x_sc)
-        y_trajectory.append(y_sc)
-        speed.append(np.sqrt(v_x**2 + v_y**2))
-        x_p, y_p = move_planet(t)
-        distance.append(np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2))
-        t += h
+        if compensated:
+            v_x, c_v_x = compensated_add(v_x, c_v_x, (h / 2) * (a_x + field[0]))
+            v_y, c_v_y = compensated_add(v_y, c_v_y, (h / 2) * (a_y + field[1]))
+            x_sc, c_x = compensated_add(x_sc, c_x, d_x)
+            y_sc, c_y = compensated_add(y_sc, c_y, d_y)
+        else:
+            v_x += (h / 2) * (a_x + field[0])
+            v_y += (h / 2) * (a_y + field[1])
+            x_sc += d_x
+            y_sc += d_y
+        trajectory.append(t, x_sc, y_sc, v_x, v_y, x_p, y_p, np.sqrt((x_sc - x_p)**2 + (y_sc - y_p)**2))
+
+    trajectory.stats = {"newton_iterations": iterations, "convergence_failures": failures, "force_evaluations": evaluations}
+    return trajectory.trim()
+
+
+# Параметры config.py, от которых зависит траектория, с учётом их переопределения в этом модуле (как в sweep.py).
+# NUM_STEPS не входит: он задаёт только горизонт, который при продолжении можно увеличить
+def run_config():
+    return {name: globals()[name] for name in vars(config) if name.isupper() and name not in ("SCENARIOS", "NUM_STEPS")}
 
-    x_planet_trajectory = [move_planet(t)[0] for t in np.linspace(0, t, NUM_STEPS+1)]
-    y_planet_trajectory = [move_planet(t)[1] for t in np.linspace(0, t, NUM_STEPS+1)]
 
-    return x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance
+# Продолжение прогона с контрольной точки path. num_steps - новый горизонт (по умолчанию прежний),
+# every - продолжать писать контрольные точки в тот же файл. Результат совпадает с непрерывным прогоном
+def resume_method(path, num_steps=None, every=None, trajectory=None):
+    resume = Checkpoint(path)
+    resume.check(run_config())
+    num_steps = resume.num_steps if num_steps is None else num_steps
+    trajectory = resume.trajectory(num_steps) if trajectory is None else trajectory
+    checkpoint = Checkpointer(path, every, run_config(), resume.rows.shape[1]) if every else None
+    method = globals()[resume.method + "_method"]
 
+    return method(**resume.params, trajectory=trajectory, num_steps=num_steps, checkpoint=checkpoint, resume=resume)
 
 
 def main():
-    # x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance \
-    #     = euler_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT)
-    # animate_trajectories(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory)
-    # draw(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance)
-
-    x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance, energy \
-        = rk4_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT)
-    animate_trajectories(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory)
-    draw_graphics(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance, energy)
-
-    # x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance \
-    #     = trapezoidal_method(X_SPACECRAFT, Y_SPACECRAFT, V_X_SPACECRAFT, V_Y_SPACECRAFT)
-    # animate_trajectories(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory)
-    # draw_graphics(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance)
-
-    # x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance \
-    #     = adams_bashforth_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT)
-    # animate_trajectories(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory)
-    # draw_graphics(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance)
+    # trajectory = euler_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT)
+    # animate_trajectories(trajectory)
+    # draw_graphics(trajectory, Energy.from_trajectory(trajectory))
+
+    trajectory = rk4_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT)
+    animate_trajectories(trajectory)
+    # animate_trajectories(trajectory, save_path='rk4.gif', workers=4)
+    draw_graphics(trajectory, Energy.from_trajectory(trajectory))
+
+    # Пучок зондов с разными начальными скоростями
+    # v_x, v_y = np.meshgrid(np.linspace(-20e3, -5e3, 100), np.linspace(-5e3, 5e3, 100))
+    # state = np.column_stack((np.full(v_x.size, X_SPACECRAFT), np.full(v_x.size, Y_SPACECRAFT), v_x.ravel(), v_y.ravel()))
+    # result = rk4_ensemble_method(state)
+
+    # Хранится каждый 100-й шаг, графики строятся по плотному выводу на равномерной сетке
+    # trajectory = rk4_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT,
+    #                         trajectory=Trajectory(NUM_STEPS // 100 + 2, every=100))
+    # dense = dense_output(trajectory)
+    # sampled = dense.sample_uniform(5000)
+    # animate_trajectories(dense)
+    # draw_graphics(sampled, Energy.from_trajectory(sampled))
+
+    # Та же задача как одна из конфигураций движка N тел (nbody.py)
+    # import nbody
+    # system = nbody.nbody_rk4_method(nbody.gravity_assist_preset())
+    # draw_graphics(system.body("probe", reference="planet"))
+
+    # Столкновение, перицентр и сфера действия - события, уточняемые внутри шага
+    # events = contact_events() + [periapsis_event()] + sphere_of_influence_events()
+    # trajectory = rk4_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT, events=events)
+    # print(trajectory.stats["events"])
+
+    # Мелкий шаг на длинном отрезке: ошибки округления при накоплении состояния компенсируются
+    # trajectory = yoshida4_method(X_SPACECRAFT, Y_SPACECRAFT, V_X_SPACECRAFT, V_Y_SPACECRAFT, dt=1,
+    #                              num_steps=NUM_STEPS * int(DT), compensated=True)
+
+    # Длинный прогон с потоковой записью каждого 10-го шага на диск и повторной отрисовкой без пересчёта
+    # from trajectory import TrajectoryWriter, open_trajectory
+    # trajectory = leapfrog_method(X_SPACECRAFT, Y_SPACECRAFT, V_X_SPACECRAFT, V_Y_SPACECRAFT,
+    #                              trajectory=TrajectoryWriter("leapfrog.bin", every=10))
+    # draw_graphics(open_trajectory("leapfrog.bin"))
+
+    # Счётчики вычислений силы и шагов, время по фазам (силы, эфемериды, запись, энергия) и столкновения
+    # from instrumentation import instrument, profile
+    # with instrument(globals()) as report:
+    #     trajectory = rk4_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT)
+    # print(report.summary())
+    # Тот же прогон под cProfile
+    # trajectory, report = profile(rk4_method, X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT)
+    # report.stats.sort_stats("cumulative").print_stats(15)
+
+    # Прогон с контрольной точкой каждые 10 суток; после прерывания - продолжение с неё же
+    # trajectory = rk4_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT,
+    #                         checkpoint=Checkpointer("rk4.ckpt", 10 * DAY, run_config()))
+    # trajectory = resume_method("rk4.ckpt", every=10 * DAY)
+    # Продление законченного прогона ещё на 1000 суток
+    # trajectory = resume_method("rk4.ckpt", num_steps=2 * NUM_STEPS)
+
+    # trajectory = dopri_method(X_SPACECRAFT, Y_SPACECRAFT, V_X_SPACECRAFT, V_Y_SPACECRAFT, rtol=1e-9)
+    # print(trajectory.stats)
+    # draw_graphics(trajectory, Energy.from_trajectory(trajectory))
+
+    # Крупный шаг без накопления дрейфа энергии
+    # trajectory = yoshida4_method(X_SPACECRAFT, Y_SPACECRAFT, V_X_SPACECRAFT, V_Y_SPACECRAFT, dt=10 * DT, num_steps=NUM_STEPS // 10)
+    # draw_graphics(trajectory, Energy.from_trajectory(trajectory))
+
+    # trajectory = trapezoidal_method(X_SPACECRAFT, Y_SPACECRAFT, V_X_SPACECRAFT, V_Y_SPACECRAFT)
+    # animate_trajectories(trajectory)
+    # draw_graphics(trajectory, Energy.from_trajectory(trajectory))
+
+    # trajectory = adams_bashforth_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT)
+    # animate_trajectories(trajectory)
+    # draw_graphics(trajectory, Energy.from_trajectory(trajectory))
   
 if __name__ == "__main__":
     main()
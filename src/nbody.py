@@ -0,0 +1,261 @@
+import numpy as np
+
+import main
+from config import *
+from events import EventDetector
+from instrumentation import record_crash
+from integrators import Stepper
+from trajectory import Trajectory
+
+
+# Таблица тел: массивные тела (притягивают остальных) и пробные частицы (mass = 0, только притягиваются).
+# Тело движется либо по уравнениям движения, либо по заданному закону ephemeris(t) -> (x, y),
+# как планета в исходной модели; fixed=True - неподвижное тело. radius - радиус столкновения
+class BodyTable:
+    def __init__(self):
+        self.names = []
+        self.mass = []
+        self.radius = []
+        self.position = []
+        self.velocity = []
+        self.ephemeris = []
+
+    def add(self, name, mass, radius=0.0, position=(0.0, 0.0), velocity=(0.0, 0.0), ephemeris=None, fixed=False):
+        if fixed:
+            ephemeris = FixedPosition(*position)
+        self.names.append(name)
+        self.mass.append(mass)
+        self.radius.append(radius)
+        self.position.append(position)
+        self.velocity.append(velocity)
+        self.ephemeris.append(ephemeris)
+        return self
+
+    def __len__(self):
+        return len(self.names)
+
+
+class FixedPosition:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __call__(self, t):
+        return self.x, self.y
+
+
+# Система, собранная из таблицы тел. Вектор состояния - как у остальных методов для одного зонда
+# ([x, y, v_x, v_y]), но для всех свободных тел сразу: [x_1..x_n, y_1..y_n, v_x_1..v_x_n, v_y_1..v_y_n]
+class System:
+    def __init__(self, table):
+        self.table = table
+        mass = np.array(table.mass, dtype=np.float64)
+        radius = np.array(table.radius, dtype=np.float64)
+        self.names = list(table.names)
+        self.dynamic = np.array([i for i, e in enumerate(table.ephemeris) if e is None], dtype=int)
+        self.prescribed = np.array([i for i, e in enumerate(table.ephemeris) if e is not None], dtype=int)
+        self.sources = np.flatnonzero(mass > 0)
+
+        # Столбцы источников поля: тела с заданным законом движения берутся из эфемерид,
+        # свободные массивные - из текущего состояния
+        # Неподвижные тела заполняются один раз, эфемериды остальных вызываются на каждой стадии
+        self._sources = np.zeros((2, len(self.sources)))
+        self._moving = []
+        for slot in np.flatnonzero(np.isin(self.sources, self.prescribed)):
+            ephemeris = table.ephemeris[self.sources[slot]]
+            if isinstance(ephemeris, FixedPosition):
+                self._sources[:, slot] = ephemeris(0)
+            else:
+                self._moving.append((slot, ephemeris))
+        self._dynamic_slots = np.flatnonzero(np.isin(self.sources, self.dynamic))
+        self._dynamic_sources = np.searchsorted(self.dynamic, self.sources[self._dynamic_slots])
+
+        self.mu = G * mass[self.sources]
+        # Пары (свободное тело, источник): касание при расстоянии не больше суммы радиусов,
+        # тело само себя не притягивает и с собой не сталкивается
+        self._self = self.dynamic[:, None] == self.sources[None, :]
+        self._has_self = self._self.any()
+        self._contact = radius[self.dynamic][:, None] + radius[self.sources][None, :]
+        self._contact2 = self._contact**2
+        self._contact2[self._self] = -np.inf
+
+    def __len__(self):
+        return len(self.dynamic)
+
+    def initial_state(self):
+        position = np.array(self.table.position, dtype=np.float64)[self.dynamic].T
+        velocity = np.array(self.table.velocity, dtype=np.float64)[self.dynamic].T
+        return np.concatenate((position.ravel(), velocity.ravel()))
+
+    def source_positions(self, t, pos):
+        sources = self._sources.copy()
+        for slot, ephemeris in self._moving:
+            sources[:, slot] = ephemeris(t)
+        sources[:, self._dynamic_slots] = pos[:, self._dynamic_sources]
+        return sources
+
+    # Разности положений свободных тел и источников (2, n, m) и квадраты расстояний между ними (n, m)
+    def separations(self, t, pos):
+        d = pos[:, :, None] - self.source_positions(t, pos)[:, None, :]
+        r2 = d[0]**2 + d[1]**2
+        if self._has_self:
+            r2[self._self] = np.inf
+        return d, r2
+
+    # Ускорения всех свободных тел от всех массивных за один проход.
+    # Возвращает ускорения (2, n), квадраты расстояний (n, m) до источников и маску касаний (n, m)
+    def accelerations(self, t, pos):
+        d, r2 = self.separations(t, pos)
+        a = -np.einsum('inm,nm->in', d, self.mu / (r2 * np.sqrt(r2)))
+
+        return a, r2, r2 <= self._contact2
+
+    # Производная вектора состояния и маска (n,) тел, коснувшихся какого-либо источника на этой стадии
+    def derivatives(self, t, state):
+        n = len(self)
+        a, _, contact = self.accelerations(t, state[:2 * n].reshape(2, n))
+        return np.concatenate((state[2 * n:], a.ravel())), contact.any(axis=1)
+
+
+# Траектория системы: состояния всех свободных тел в сохранённые моменты времени.
+# every - как у Trajectory: каждый k-й шаг, последний шаг прогона дописывает trim()
+class SystemTrajectory:
+    def __init__(self, system, capacity, every=1):
+        self.system = system
+        self.t = np.empty(capacity)
+        self.states = np.empty((capacity, 4 * len(system)))
+        self.length = 0
+        self.crashed = np.zeros(len(system), dtype=bool)
+        self.crashes = []
+        self.stats = {}
+        self._every = every
+        self._skipped = 0
+        self._pending = None
+
+    def append(self, t, state):
+        if self._skipped:
+            # Симплектические методы меняют состояние на месте, поэтому пропущенный шаг копируется
+            self._skipped = (self._skipped + 1) % self._every
+            self._pending = (t, state.copy())
+            return
+        self._skipped = 1 % self._every
+        if self.length == len(self.t):
+            self.t = np.concatenate((self.t, np.empty(len(self.t))))
+            self.states = np.concatenate((self.states, np.empty_like(self.states)))
+        self.t[self.length] = t
+        self.states[self.length] = state
+        self.length += 1
+
+    def trim(self):
+        if self._pending is not None and self._skipped != 1 % self._every:
+            self._skipped = 0
+            self.append(*self._pending)
+        self._pending = None
+
+        self.t = self.t[:self.length]
+        self.states = self.states[:self.length]
+        return self
+
+    def __len__(self):
+        return self.length
+
+    def position(self, name):
+        index = self.system.names.index(name)
+        if index in self.system.prescribed:
+            x, y = self.system.table.ephemeris[index](self.t)
+            return np.vstack(np.broadcast_arrays(x, y, self.t)[:2])
+        n, k = len(self.system), np.searchsorted(self.system.dynamic, index)
+        return self.states[:, [k, n + k]].T
+
+    def velocity(self, name):
+        n, k = len(self.system), np.searchsorted(self.system.dynamic, self.system.names.index(name))
+        return self.states[:, [2 * n + k, 3 * n + k]].T
+
+    # Траектория одного свободного тела в прежнем формате Trajectory (для draw_graphics, Energy):
+    # reference - тело, относительно которого считаются x_planet, y_planet и distance
+    def body(self, name, reference="planet"):
+        x, y = self.position(name)
+        v_x, v_y = self.velocity(name)
+        x_r, y_r = self.position(reference)
+        crashed = bool(self.crashed[np.searchsorted(self.system.dynamic, self.system.names.index(name))])
+        return Trajectory.from_data(np.vstack((self.t, x, y, v_x, v_y, x_r, y_r, np.hypot(x - x_r, y - y_r))),
+                                    crashed, self.stats)
+
+
+# Столкнувшееся тело замораживается: дальше его состояние не меняется, но как источник поля оно остаётся.
+# Касание могло случиться на любой стадии шага, поэтому препятствием считается источник,
+# ближе всех подошедший к касанию в начале шага
+def _record_contacts(system, trajectory, t, state, crashed):
+    n = len(system)
+    pos = state[:2 * n].reshape(2, n)
+    _, r2 = system.separations(t, pos)
+    into = np.argmin(np.sqrt(r2) - system._contact, axis=1)
+    for k in np.flatnonzero(crashed):
+        body, other = system.names[system.dynamic[k]], system.names[system.sources[into[k]]]
+        distance = np.sqrt(r2[k, into[k]])
+        trajectory.crashes.append({"body": body, "into": other, "t": t, "distance": distance})
+        record_crash(other, pos[0, k], pos[1, k], distance)
+    trajectory.crashed |= crashed
+
+
+# Общий цикл integrators.Stepper для системы: строка траектории - состояние всех свободных тел.
+# events - события от вектора состояния всей системы; касания, в отличие от одного зонда, всегда проверяются
+# на стадиях: событие-крушение не говорит, какое из тел столкнулось
+def _start(system, state, capacity, t_start, every=1, events=None, compensated=False):
+    state = system.initial_state() if state is None else np.array(state, dtype=np.float64)
+    trajectory = SystemTrajectory(system, capacity, every)
+    trajectory.append(t_start, state)
+    detector = None if events is None else EventDetector(events, lambda t, state: system.derivatives(t, state)[0])
+    crash = lambda t, state, crashed: _record_contacts(system, trajectory, t, state, crashed)
+    return state, trajectory, Stepper(system.derivatives, trajectory.append, crash, detector, compensated)
+
+
+def _result(trajectory, stepper):
+    trajectory.stats["force_evaluations"] = stepper.evaluations
+    if stepper.detector is not None:
+        trajectory.stats["events"] = stepper.detector.found
+    return trajectory.trim()
+
+
+# Метод Рунге-Кутты 4-го порядка для всей системы. every - сохранять каждый k-й шаг.
+# Как и в пакетном методе, столкнувшееся тело замораживается, остальные летят дальше.
+# compensated - компенсированное суммирование состояния, как у rk4_method
+def nbody_rk4_method(system, t_start=0, dt=DT, num_steps=NUM_STEPS, every=1, state=None, events=None,
+                     compensated=False):
+    state, trajectory, stepper = _start(system, state, num_steps // every + 2, t_start, every, events, compensated)
+    stepper.rk4(state, t_start, dt, num_steps)
+    return _result(trajectory, stepper)
+
+
+# Симплектический leapfrog (kick-drift-kick) для всей системы: одно вычисление сил на шаг
+def nbody_leapfrog_method(system, t_start=0, dt=DT, num_steps=NUM_STEPS, every=1, state=None, events=None,
+                          compensated=False):
+    state, trajectory, stepper = _start(system, state, num_steps // every + 2, t_start, every, events, compensated)
+    stepper.leapfrog(state, t_start, dt, num_steps)
+    return _result(trajectory, stepper)
+
+
+# Метод Иошиды 4-го порядка для всей системы, с теми же коэффициентами, что и yoshida4_method
+def nbody_yoshida4_method(system, t_start=0, dt=DT, num_steps=NUM_STEPS, every=1, state=None, events=None,
+                          compensated=False):
+    state, trajectory, stepper = _start(system, state, num_steps // every + 2, t_start, every, events, compensated)
+    stepper.yoshida4(state, t_start, dt, num_steps)
+    return _result(trajectory, stepper)
+
+
+# Метод Дормана-Принса 5(4) с адаптивным шагом для всей системы. Сохраняется каждый принятый шаг
+def nbody_dopri_method(system, t_start=0, t_end=NUM_STEPS * DT, rtol=1e-9, atol=1e-6, h=DT, h_max=np.inf,
+                       safety=0.9, factor_min=0.2, factor_max=5.0, state=None, events=None, compensated=False):
+    state, trajectory, stepper = _start(system, state, 1024, t_start, events=events, compensated=compensated)
+    stepper.dopri(state, t_start, t_end, rtol, atol, h, h_max, safety, factor_min, factor_max)
+    trajectory.stats = {"accepted_steps": stepper.accepted, "rejected_steps": stepper.rejected}
+    return _result(trajectory, stepper)
+
+
+# Исходная модель как одна из конфигураций: неподвижная звезда, планета на заданной круговой орбите
+# (move_planet) и зонд - пробная частица
+def gravity_assist_preset(x_sc=X_SPACECRAFT, y_sc=Y_SPACECRAFT, v_x=V_X_SPACECRAFT, v_y=V_Y_SPACECRAFT):
+    return System(BodyTable()
+                  .add("star", M_STAR, R_STAR, (X_STAR, Y_STAR), fixed=True)
+                  .add("planet", M_PLANET, R_PLANET, ephemeris=main.move_planet)
+                  .add("probe", 0, 0.0, (x_sc, y_sc), (v_x, v_y)))
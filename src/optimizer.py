@@ -0,0 +1,119 @@
+import argparse
+
+import numpy as np
+
+import main
+from config import *
+
+# Зонды быстрее этого после короткого прогона считаются численно разошедшимися (м/с)
+DIVERGENCE_SPEED = 1e6
+
+
+def initial_states(params):
+    # params - массив (M, 2) из v_x, v_y или (M, 3) с моментом старта относительно фазы планеты OMEGA * t.
+    # Зонд стартует в той же точке относительно планеты, что и в config.py
+    t_launch = params[:, 2] if params.shape[1] > 2 else np.zeros(len(params))
+    x_p, y_p = main.move_planet(t_launch)
+    x_sc = x_p + (X_SPACECRAFT - X_PLANET)
+    y_sc = y_p + (Y_SPACECRAFT - Y_PLANET)
+
+    return np.column_stack((x_sc, y_sc, params[:, 0], params[:, 1])), t_launch
+
+
+def final_speeds(params, num_steps, screen_steps):
+    # Конечная скорость (speed[-1]) для каждого набора параметров; -inf для отброшенных кандидатов.
+    # Сначала все кандидаты интегрируются короткий отрезок screen_steps, дальше летят только выжившие
+    speeds = np.full(len(params), -np.inf)
+    states, t_launch = initial_states(params)
+    screen_steps = min(screen_steps, num_steps)
+
+    result = main.rk4_ensemble_method(states, t_launch, screen_steps)
+    alive = ~result.crashed & np.isfinite(result.state).all(axis=1) & (result.speed < DIVERGENCE_SPEED)
+    if num_steps > screen_steps and alive.any():
+        t = np.broadcast_to(result.t, len(params))[alive]
+        survivors = np.flatnonzero(alive)
+        result = main.rk4_ensemble_method(result.state[alive], t, num_steps - screen_steps)
+        alive = ~result.crashed & np.isfinite(result.state).all(axis=1)
+        speeds[survivors[alive]] = result.speed[alive]
+    else:
+        speeds[alive] = result.speed[alive]
+
+    return speeds, int(alive.sum())
+
+
+def optimize_launch(v_x_range=(-25e3, -5e3), v_y_range=(-10e3, 10e3), grid_size=21, phases=None,
+                    num_steps=NUM_STEPS, screen_steps=None, starts=4, tolerance=1.0, max_iterations=50):
+    # Поиск вектора стартовой скорости (и, при заданных phases, момента старта) в пределах сетки,
+    # максимизирующего прирост скорости speed[-1] - |v0|: грубая сетка одним пакетом, затем
+    # покоординатный поиск с уменьшением шага одновременно из нескольких лучших узлов
+    screen_steps = screen_steps or max(num_steps // 20, 1)
+    axes = [np.linspace(*v_x_range, grid_size), np.linspace(*v_y_range, grid_size)]
+    if phases is not None:
+        axes.append(np.asarray(phases, dtype=np.float64))
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+
+    lower, upper = grid.min(axis=0), grid.max(axis=0)
+
+    speeds, full_runs = final_speeds(grid, num_steps, screen_steps)
+    gains = speeds - np.hypot(grid[:, 0], grid[:, 1])
+    evaluated, integrated = len(grid), full_runs
+    order = np.argsort(gains)[::-1][:starts]
+    order = order[np.isfinite(gains[order])]
+    if len(order) == 0:
+        raise RuntimeError("Все кандидаты грубой сетки отброшены (столкновение или расходимость)")
+    points, values, point_speeds = grid[order], gains[order], speeds[order]
+
+    # Начальный шаг поиска - шаг грубой сетки по каждой оси
+    step = np.tile([(a[-1] - a[0]) / max(len(a) - 1, 1) if len(a) > 1 else 0 for a in axes], (len(points), 1))
+    directions = np.vstack((np.eye(len(axes)), -np.eye(len(axes))))
+
+    for _ in range(max_iterations):
+        if (step[:, :2] <= tolerance).all():
+            break
+        neighbours = np.clip(points[:, None, :] + directions[None, :, :] * step[:, None, :], lower, upper)
+        candidates = neighbours.reshape(-1, len(axes))
+        candidate_speeds, full_runs = final_speeds(candidates, num_steps, screen_steps)
+        candidate_gains = (candidate_speeds - np.hypot(candidates[:, 0], candidates[:, 1])).reshape(len(points), -1)
+        candidate_speeds = candidate_speeds.reshape(len(points), -1)
+        evaluated, integrated = evaluated + len(candidates), integrated + full_runs
+
+        best = candidate_gains.argmax(axis=1)
+        improved = candidate_gains[np.arange(len(points)), best] > values
+        points[improved] = neighbours[improved, best[improved]]
+        values[improved] = candidate_gains[improved, best[improved]]
+        point_speeds[improved] = candidate_speeds[improved, best[improved]]
+        step[~improved] /= 2
+
+    winner = values.argmax()
+    return {
+        "v_x": points[winner, 0],
+        "v_y": points[winner, 1],
+        "t_launch": points[winner, 2] if len(axes) > 2 else 0.0,
+        "final_speed": point_speeds[winner],
+        "delta_v_gain": values[winner],
+        "candidates": evaluated,
+        "full_integrations": integrated,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Поиск стартовой скорости для максимального прироста скорости в гравитационном манёвре")
+    parser.add_argument("--vx", default="-25e3:-5e3", help="диапазон v_x, min:max (м/с)")
+    parser.add_argument("--vy", default="-10e3:10e3", help="диапазон v_y, min:max (м/с)")
+    parser.add_argument("--grid-size", type=int, default=21)
+    parser.add_argument("--phases", type=int, default=0, help="число моментов старта на периоде T (0 - только t = 0)")
+    parser.add_argument("--num-steps", type=int, default=NUM_STEPS)
+    parser.add_argument("--screen-steps", type=int, default=None)
+    parser.add_argument("--starts", type=int, default=4)
+    parser.add_argument("--tolerance", type=float, default=1.0, help="точность по скорости (м/с)")
+    args = parser.parse_args()
+
+    phases = np.linspace(0, T, args.phases, endpoint=False) if args.phases else None
+    result = optimize_launch(tuple(map(float, args.vx.split(":"))), tuple(map(float, args.vy.split(":"))),
+                             args.grid_size, phases, args.num_steps, args.screen_steps, args.starts, args.tolerance)
+    for name, value in result.items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,145 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import config
+
+# Методы, которые можно запускать из перебора
+METHODS = ("euler", "rk4", "adams_bashforth", "trapezoidal", "dopri", "leapfrog", "yoshida4")
+COLUMNS = ("case", "method", "final_speed", "closest_approach", "crashed", "energy_change")
+
+
+def case_config(case):
+    # Полная конфигурация случая: значения из config.py с переопределениями случая
+    # и пересчитанными производными величинами (все, что в config.py выражены через другие параметры)
+    cfg = {name: value for name, value in vars(config).items() if name.isupper() and name != "SCENARIOS"}
+    cfg.update({name: value for name, value in case.items() if name.isupper()})
+    cfg["X_STAR"] = cfg["X_PLANET"] + cfg["ORBIT_RADIUS"]
+    cfg["OMEGA"] = 2 * np.pi / cfg["T"]
+    cfg["INITIAL_DISTANCE"] = np.sqrt((cfg["X_SPACECRAFT"] - cfg["X_PLANET"])**2 +
+                                      (cfg["Y_SPACECRAFT"] - cfg["Y_PLANET"])**2)
+    return cfg
+
+
+def run_method(main, method, cfg):
+    x_sc, y_sc = cfg["X_SPACECRAFT"], cfg["Y_SPACECRAFT"]
+    v_x, v_y = cfg["V_X_SPACECRAFT"], cfg["V_Y_SPACECRAFT"]
+    x_p, y_p = cfg["X_PLANET"], cfg["Y_PLANET"]
+    dt, num_steps = cfg["DT"], cfg["NUM_STEPS"]
+
+    if method == "euler":
+        return main.euler_method(x_sc, y_sc, x_p, y_p, v_x, v_y)
+    if method == "rk4":
+        return main.rk4_method(x_sc, y_sc, x_p, y_p, v_x, v_y, num_steps=num_steps)
+    if method == "adams_bashforth":
+        return main.adams_bashforth_method(x_sc, y_sc, x_p, y_p, v_x, v_y, num_steps=num_steps)
+    if method == "trapezoidal":
+        return main.trapezoidal_method(x_sc, y_sc, v_x, v_y)
+    if method == "dopri":
+        return main.dopri_method(x_sc, y_sc, v_x, v_y, t_end=num_steps * dt, h=dt)
+    if method == "leapfrog":
+        return main.leapfrog_method(x_sc, y_sc, v_x, v_y, dt=dt, num_steps=num_steps)
+    if method == "yoshida4":
+        return main.yoshida4_method(x_sc, y_sc, v_x, v_y, dt=dt, num_steps=num_steps)
+    raise ValueError(f"Неизвестный метод: {method}")
+
+
+def run_case(case):
+    # Выполняется в отдельном процессе: конфигурация случая целиком подставляется
+    # в пространство имён модуля main этого процесса перед каждым запуском
+    import main
+
+    cfg = case_config(case)
+    vars(main).update(cfg)
+    method = case.get("method", "rk4")
+    trajectory = run_method(main, method, cfg)
+
+    x_p, y_p = main.move_planet(0)
+    initial = main.Energy(cfg["X_SPACECRAFT"], cfg["Y_SPACECRAFT"], cfg["V_X_SPACECRAFT"], cfg["V_Y_SPACECRAFT"], x_p, y_p)
+    if len(trajectory):
+        final = main.Energy(trajectory.x[-1], trajectory.y[-1], trajectory.v_x[-1], trajectory.v_y[-1],
+                            trajectory.x_planet[-1], trajectory.y_planet[-1])
+        # Энергия зонда при движущейся планете не сохраняется: это не ошибка метода, а приобретённая
+        # (или потерянная) в манёвре энергия, относительно начальной
+        energy_change = (final.total_energy - initial.total_energy) / abs(initial.total_energy)
+        final_speed = trajectory.speed[-1]
+        closest_approach = trajectory.distance.min()
+    else:
+        energy_change = final_speed = closest_approach = np.nan
+
+    return {
+        "case": case.get("name", ""),
+        "method": method,
+        "final_speed": final_speed,
+        "closest_approach": closest_approach,
+        "crashed": trajectory.crashed,
+        "energy_change": energy_change,
+    }
+
+
+def make_cases(scenarios=(), grid=None, method="rk4", **overrides):
+    # Декартово произведение сценариев и сетки значений параметров
+    grid = grid or {}
+    bases = [dict(config.SCENARIOS[name], name=name) for name in scenarios] or [{"name": "default"}]
+    cases = []
+    for base in bases:
+        for values in itertools.product(*grid.values()):
+            case = dict(base, method=method, **overrides)
+            case.update(zip(grid.keys(), values))
+            if grid:
+                case["name"] = base["name"] + "[" + ", ".join(f"{k}={v:g}" for k, v in zip(grid.keys(), values)) + "]"
+            cases.append(case)
+    return cases
+
+
+def run_sweep(cases, workers=None):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_case, cases))
+
+
+def format_table(rows):
+    lines = ["\t".join(COLUMNS)]
+    for row in rows:
+        lines.append("\t".join(f"{row[c]:.6g}" if isinstance(row[c], float) else str(row[c]) for c in COLUMNS))
+    return "\n".join(lines)
+
+
+def parse_grid(items):
+    # NAME=start:stop:num (равномерная сетка) или NAME=v1,v2,...
+    grid = {}
+    for item in items:
+        name, values = item.split("=", 1)
+        if ":" in values:
+            start, stop, num = values.split(":")
+            grid[name] = list(np.linspace(float(start), float(stop), int(num)))
+        else:
+            grid[name] = [float(v) for v in values.split(",")]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Параллельный перебор начальных условий")
+    parser.add_argument("--scenario", action="append", default=[], choices=sorted(config.SCENARIOS),
+                        help="сценарий из config.SCENARIOS (можно несколько)")
+    parser.add_argument("--grid", action="append", default=[],
+                        help="сетка параметра: NAME=start:stop:num или NAME=v1,v2,...")
+    parser.add_argument("--method", default="rk4", choices=METHODS)
+    parser.add_argument("--dt", type=float, default=config.DT)
+    parser.add_argument("--num-steps", type=int, default=config.NUM_STEPS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", help="сохранить таблицу в файл (TSV)")
+    args = parser.parse_args()
+
+    cases = make_cases(args.scenario, parse_grid(args.grid), args.method, DT=args.dt, NUM_STEPS=args.num_steps)
+    table = format_table(run_sweep(cases, args.workers))
+    print(table)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(table + "\n")
+
+
+if __name__ == "__main__":
+    main()
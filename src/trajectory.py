@@ -0,0 +1,267 @@
+import json
+
+import numpy as np
+
+
+# Траектория хранится как набор заранее выделенных непрерывных массивов float64
+# (по строке на каждое поле), а не как списки питоновских чисел.
+# every - хранить только каждый k-й шаг (промежуточные восстанавливает DenseOutput); последний шаг прогона
+# (конец, терминальное событие, шаг перед крушением) сохраняется всегда - его дописывает trim()
+class Trajectory:
+    FIELDS = ("t", "x", "y", "v_x", "v_y", "x_planet", "y_planet", "distance")
+
+    def __init__(self, capacity, every=1):
+        self.capacity = capacity
+        self.length = 0
+        self.crashed = False
+        self.stats = {}
+        self._data = np.empty((len(self.FIELDS), capacity), dtype=np.float64)
+        self._every = every
+        self._skipped = 0
+        self._pending = None
+
+    def append(self, t, x_sc, y_sc, v_x, v_y, x_p, y_p, r):
+        if self._skipped:
+            self._skipped = (self._skipped + 1) % self._every
+            self._pending = (t, x_sc, y_sc, v_x, v_y, x_p, y_p, r)
+            return
+        self._skipped = 1 % self._every
+        if self.length == self.capacity:
+            self._grow()
+        self._data[:, self.length] = (t, x_sc, y_sc, v_x, v_y, x_p, y_p, r)
+        self.length += 1
+
+    def _grow(self):
+        # Запасной путь для методов с заранее неизвестным числом шагов
+        self.capacity = max(2 * self.capacity, 1)
+        data = np.empty((len(self.FIELDS), self.capacity), dtype=np.float64)
+        data[:, :self.length] = self._data[:, :self.length]
+        self._data = data
+
+    def trim(self):
+        # Пропущенный при прореживании последний шаг; после сохранённого шага _skipped == 1 % every
+        if self._pending is not None and self._skipped != 1 % self._every:
+            self._skipped = 0
+            self.append(*self._pending)
+        self._pending = None
+
+        # Обрезаем буферы по последнему записанному шагу (например, после крушения)
+        if self.length < self.capacity:
+            self._data = np.ascontiguousarray(self._data[:, :self.length])
+            self.capacity = self.length
+        return self
+
+    def __len__(self):
+        return self.length
+
+    # Траектория поверх готового массива формы (len(FIELDS), n) без копирования, например поверх np.memmap
+    @classmethod
+    def from_data(cls, data, crashed=False, stats=None):
+        trajectory = cls(0)
+        trajectory._data = data
+        trajectory.capacity = trajectory.length = data.shape[1]
+        trajectory.crashed = crashed
+        trajectory.stats = stats or {}
+        return trajectory
+
+    # Каждый k-й шаг и всегда последний (конец прогона или крушение): см. every_index
+    def every(self, k):
+        return Trajectory.from_data(self._data[:, every_index(self.length, k)], self.crashed, self.stats)
+
+    def _field(self, index):
+        return self._data[index, :self.length]
+
+    t = property(lambda self: self._field(0))
+    x = property(lambda self: self._field(1))
+    y = property(lambda self: self._field(2))
+    v_x = property(lambda self: self._field(3))
+    v_y = property(lambda self: self._field(4))
+    x_planet = property(lambda self: self._field(5))
+    y_planet = property(lambda self: self._field(6))
+    distance = property(lambda self: self._field(7))
+
+    @property
+    def speed(self):
+        return np.hypot(self.v_x, self.v_y)
+
+    # Траектория, линейно интерполированная на новую сетку времени
+    def resample(self, times):
+        resampled = Trajectory(len(times))
+        resampled._data[0] = times
+        for i in range(1, len(self.FIELDS)):
+            resampled._data[i] = np.interp(times, self.t, self._field(i))
+        resampled.length = len(times)
+        resampled.crashed = self.crashed
+        return resampled
+
+
+# Индекс для прореживания n строк: каждая k-я и последняя. Если последняя попадает в сетку, это срез
+# (для траектории - представление без копирования), иначе - массив номеров, по которому копируются только
+# выбранные строки
+def every_index(n, k):
+    if n == 0 or (n - 1) % k == 0:
+        return slice(0, n, k)
+    return np.append(np.arange(0, n, k), n - 1)
+
+
+# Базисные функции эрмитова сплайна 5-й степени на [0, 1] и их производные: коэффициенты при
+# p0, h v0, h^2 a0, h^2 a1, h v1, p1 (строки) для степеней s^0..s^5 (столбцы)
+QUINTIC_HERMITE = np.array([
+    [1, 0, 0, -10, 15, -6],
+    [0, 1, 0, -6, 8, -3],
+    [0, 0, 0.5, -1.5, 1.5, -0.5],
+    [0, 0, 0, 0.5, -1, 0.5],
+    [0, 0, 0, -4, 7, -3],
+    [0, 0, 0, 10, -15, 6],
+])
+QUINTIC_HERMITE_DERIVATIVE = QUINTIC_HERMITE[:, 1:] * np.arange(1, 6)
+
+
+# Плотный вывод: непрерывное продолжение траектории между сохранёнными узлами. На каждом интервале -
+# эрмитов сплайн 5-й степени по положению, скорости и ускорению в узлах (ускорения считаются одним векторным
+# вызовом acceleration(t, pos) -> (2, n) по сохранённым строкам), скорость - его производная.
+# Подходит для траектории любого метода, в том числе прореженной (every) или открытой с диска.
+# planet(t) -> (x_p, y_p) - точные положения планеты на новой сетке; без него они интерполируются линейно
+class DenseOutput:
+    def __init__(self, trajectory, acceleration, planet=None):
+        if len(trajectory) < 2:
+            raise ValueError("Для плотного вывода нужны хотя бы два сохранённых узла траектории")
+        self.trajectory = trajectory
+        self.planet = planet
+        self.t = np.array(trajectory.t)
+        self.position = np.vstack((trajectory.x, trajectory.y))
+        self.velocity = np.vstack((trajectory.v_x, trajectory.v_y))
+        self.acceleration = acceleration(self.t, self.position)
+
+    def __len__(self):
+        return len(self.t)
+
+    # Состояние (x, y, v_x, v_y) в моменты times - массив формы (4, len(times)), для одного момента - (4,).
+    # Вне отрезка между первым и последним узлом сплайн стал бы экстраполяцией, поэтому такие моменты - ошибка
+    def __call__(self, times):
+        scalar = np.ndim(times) == 0
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        if times.size and (times.min() < self.t[0] or times.max() > self.t[-1]):
+            raise ValueError(f"Моменты вне сохранённого отрезка траектории [{self.t[0]}, {self.t[-1]}]")
+        i = np.clip(np.searchsorted(self.t, times, side="right") - 1, 0, len(self.t) - 2)
+        h = self.t[i + 1] - self.t[i]
+        s = (times - self.t[i]) / h
+
+        # Слагаемые p0, h v0, h^2 a0, h^2 a1, h v1, p1 для каждого момента: (6, 2, len(times))
+        terms = np.stack((self.position[:, i], h * self.velocity[:, i], h**2 * self.acceleration[:, i],
+                          h**2 * self.acceleration[:, i + 1], h * self.velocity[:, i + 1], self.position[:, i + 1]))
+        powers = s ** np.arange(6)[:, None]
+        position = np.einsum('kp,pn,kin->in', QUINTIC_HERMITE, powers, terms)
+        velocity = np.einsum('kp,pn,kin->in', QUINTIC_HERMITE_DERIVATIVE, powers[:5], terms) / h
+
+        state = np.vstack((position, velocity))
+        return state[:, 0] if scalar else state
+
+    # Траектория на заданной сетке времени (в пределах сохранённых узлов)
+    def sample(self, times):
+        times = np.asarray(times, dtype=np.float64)
+        x, y, v_x, v_y = self(times)
+        if self.planet is None:
+            x_p = np.interp(times, self.t, self.trajectory.x_planet)
+            y_p = np.interp(times, self.t, self.trajectory.y_planet)
+        else:
+            x_p, y_p = np.broadcast_arrays(*self.planet(times))
+        return Trajectory.from_data(np.vstack((times, x, y, v_x, v_y, x_p, y_p, np.hypot(x - x_p, y - y_p))),
+                                    self.trajectory.crashed, self.trajectory.stats)
+
+    def sample_uniform(self, num_points):
+        return self.sample(np.linspace(self.t[0], self.t[-1], num_points))
+
+
+# Потоковая запись траектории на диск кусками фиксированного размера вместо хранения в памяти.
+# Подставляется в интеграторы вместо Trajectory: файл path - сырые float64 построчно (поля Trajectory.FIELDS
+# на каждый сохранённый шаг), метаданные - в path + ".json". every - сохранять только каждый k-й шаг
+# (и, как в Trajectory, последний шаг прогона - он дописывается при закрытии).
+# length > 0 - дописывать в существующий файл после первых length строк (продолжение с контрольной точки),
+# skipped и pending - состояние прореживания на момент контрольной точки
+class TrajectoryWriter:
+    def __init__(self, path, chunk_size=65536, every=1, length=0, skipped=0, pending=None):
+        self.path = path
+        self.every = every
+        self.length = length
+        self.crashed = False
+        self.stats = {}
+        self._chunk = np.empty((chunk_size, len(Trajectory.FIELDS)), dtype=np.float64)
+        self._filled = 0
+        self._skipped = skipped
+        self._pending = pending
+        if length:
+            self._file = open(path, "r+b")
+            self._file.truncate(length * self._chunk.itemsize * self._chunk.shape[1])
+            self._file.seek(0, 2)
+        else:
+            self._file = open(path, "wb")
+
+    def append(self, *values):
+        if self._skipped:
+            self._skipped = (self._skipped + 1) % self.every
+            self._pending = values
+            return
+        self._skipped = 1 % self.every
+        self._chunk[self._filled] = values
+        self._filled += 1
+        if self._filled == len(self._chunk):
+            self.flush()
+
+    def flush(self):
+        self._file.write(self._chunk[:self._filled].tobytes())
+        self._file.flush()
+        self.length += self._filled
+        self._filled = 0
+
+    def __len__(self):
+        return self.length + self._filled
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self._pending is not None and self._skipped != 1 % self.every:
+            self._skipped = 0
+            self.append(*self._pending)
+        self._pending = None
+        self.flush()
+        self._file.close()
+        with open(self.path + ".json", "w") as f:
+            json.dump({"fields": Trajectory.FIELDS, "length": self.length, "every": self.every,
+                       "crashed": self.crashed, "stats": self.stats}, f)
+
+    # Завершение записи; интеграторы получают обратно траекторию, лениво открытую с диска
+    def trim(self):
+        self.close()
+        return open_trajectory(self.path)
+
+
+# Ленивое открытие записанной траектории: данные отображаются в память (np.memmap)
+# и читаются с диска только при обращении к ним
+def open_trajectory(path):
+    with open(path + ".json") as f:
+        meta = json.load(f)
+    if meta["length"] == 0:
+        return Trajectory.from_data(np.empty((len(meta["fields"]), 0)), meta["crashed"], meta["stats"])
+    data = np.memmap(path, dtype=np.float64, mode="r", shape=(meta["length"], len(meta["fields"])))
+    return Trajectory.from_data(data.T, meta["crashed"], meta["stats"])
+
+
+# Итог пакетного интегрирования: конечные состояния зондов (N, 4) без полной истории
+class EnsembleResult:
+    def __init__(self, state, t, crash_step, min_distance):
+        self.state = state
+        self.t = t
+        self.crash_step = crash_step
+        self.min_distance = min_distance
+
+    def __len__(self):
+        return len(self.state)
+
+    @property
+    def crashed(self):
+        return self.crash_step >= 0
+
+    @property
+    def speed(self):
+        return np.hypot(self.state[:, 2], self.state[:, 3])
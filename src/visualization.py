@@ -1,16 +1,31 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.animation import FuncAnimation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
 
 from config import *
+from trajectory import DenseOutput, every_index
 
-def draw_graphics(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_trajectory, speed, distance, energy):
+# Для длинных (в том числе открытых с диска) траекторий рисуется не больше max_points точек;
+# последняя точка (конец прогона или крушение) остаётся всегда
+def draw_graphics(trajectory, energy=None, max_points=200000):
+    stride = max(-(-len(trajectory) // max_points), 1)
+    index = every_index(len(trajectory), stride)
+    trajectory = trajectory.every(stride)
     plot_limit = 2 * ORBIT_RADIUS
     fig1, ax1 = plt.subplots(figsize=(10, 10))
-    ax1.plot(x_trajectory, y_trajectory, label='Spacecraft Trajectory')
-    ax1.plot(x_planet_trajectory, y_planet_trajectory, label='Planet Trajectory', linestyle='--')
+    ax1.plot(trajectory.x, trajectory.y, label='Spacecraft Trajectory')
+    ax1.plot(trajectory.x_planet, trajectory.y_planet, label='Planet Trajectory', linestyle='--')
     ax1.plot(X_PLANET, Y_PLANET, 'ro', markersize=10, label='Planet')  
-    ax1.plot(x_trajectory[0], y_trajectory[0], 'go', markersize=8, label='Start Point')  
+    ax1.plot(trajectory.x[0], trajectory.y[0], 'go', markersize=8, label='Start Point')  
     ax1.plot(X_STAR, Y_STAR, 'yo', markersize=15, label = "Sun")
     ax1.set_aspect('equal', adjustable='box')
     ax1.set_xlabel('X coordinate (m)')
@@ -22,7 +37,8 @@ def draw_graphics(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_traj
     ax1.legend()
 
     fig2, ax2 = plt.subplots(figsize=(10, 5))
-    time = np.arange(0, len(speed) * DT, DT)
+    time = trajectory.t
+    speed = trajectory.speed
     ax2.plot(time, speed)
     ax2.axhline(speed[0], color='r', linestyle='--', label=f'Initial Speed: {speed[0]:.2f} m/s')
     ax2.axhline(speed[-1], color='g', linestyle='--', label=f'Final Speed: {speed[-1]:.2f} m/s')
@@ -35,21 +51,21 @@ def draw_graphics(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_traj
     ax2.legend()  
 
     fig3, ax3 = plt.subplots(figsize=(10, 5))
-    ax3.plot(time, distance)
+    ax3.plot(time, trajectory.distance)
     ax3.set_xlabel('Time (s)')
     ax3.set_ylabel('Distance (m)')
     ax3.set_title('Distance Between Spacecraft and Planet Over Time')
     ax3.grid(True)
 
+    if energy is None:
+        plt.show()
+        return
+
     fig4, ax4 = plt.subplots(figsize=(10, 5))
-    kinetic_energy = [e.kinetic_energy for e in energy]
-    potential_energy_planet = [e.potential_energy_planet for e in energy]
-    potential_energy_star = [e.potential_energy_star for e in energy]
-    total_energy = [e.total_energy for e in energy]
-    ax4.plot(time, kinetic_energy, label='Kinetic Energy')
-    ax4.plot(time, potential_energy_planet, label='Potential Energy from Planet')
-    ax4.plot(time, potential_energy_star, label='Potential Energy from Sun')
-    ax4.plot(time, total_energy, label='Total Energy')
+    ax4.plot(time, energy.kinetic_energy[index], label='Kinetic Energy')
+    ax4.plot(time, energy.potential_energy_planet[index], label='Potential Energy from Planet')
+    ax4.plot(time, energy.potential_energy_star[index], label='Potential Energy from Sun')
+    ax4.plot(time, energy.total_energy[index], label='Total Energy')
     ax4.set_xlabel('Time (s)')
     ax4.set_ylabel('Energy (J)')
     ax4.set_title('Energy of the Spacecraft Over Time')
@@ -58,11 +74,50 @@ def draw_graphics(x_trajectory, y_trajectory, x_planet_trajectory, y_planet_traj
 
     plt.show()
 
-def animate_trajectories(x_traj, y_traj, x_planet_traj, y_planet_traj):
-    assert len(x_traj) == len(y_traj) == len(x_planet_traj) == len(y_planet_traj), \
-        "Размеры массивов траекторий должны быть равны!"
+# Диаграммы работа-точность по результатам benchmark.py: по столбцу на сценарий, линия на метод.
+# Сверху - ошибка конечного положения от числа вычислений силы, снизу - ошибка энергии от времени счёта
+def draw_work_precision(rows, save_path=None):
+    scenarios = list(dict.fromkeys(row["scenario"] for row in rows))
+    methods = list(dict.fromkeys(row["method"] for row in rows))
+    fig, axes = plt.subplots(2, len(scenarios), figsize=(5 * len(scenarios), 9), squeeze=False)
 
-    fig, ax = plt.subplots(figsize=(10, 10))
+    for column, scenario in enumerate(scenarios):
+        for method in methods:
+            points = [row for row in rows if row["scenario"] == scenario and row["method"] == method]
+            points.sort(key=lambda row: row["force_evaluations"])
+            axes[0, column].loglog([row["force_evaluations"] for row in points],
+                                   [row["position_error"] for row in points], 'o-', label=method)
+            points.sort(key=lambda row: row["wall_time"])
+            axes[1, column].loglog([row["wall_time"] for row in points],
+                                   [row["energy_error"] for row in points], 'o-', label=method)
+        axes[0, column].set_title(scenario)
+        axes[0, column].set_xlabel('Force evaluations')
+        axes[0, column].set_ylabel('Final position error (m)')
+        axes[1, column].set_xlabel('Wall time (s)')
+        axes[1, column].set_ylabel('Relative final energy error')
+        for ax in axes[:, column]:
+            ax.grid(True, which='both', alpha=0.3)
+    axes[0, 0].legend()
+    fig.tight_layout()
+
+    if save_path is None:
+        plt.show()
+    else:
+        fig.savefig(save_path)
+        plt.close(fig)
+
+# Кадры анимации: траектория, пересэмплированная по времени на fps * duration кадров
+# (для DenseOutput кадры берутся прямо из интерполянта)
+def animation_frames(trajectory, fps=30, duration=20):
+    if isinstance(trajectory, DenseOutput):
+        return trajectory.sample_uniform(max(int(fps * duration), 1))
+    num_frames = max(min(int(fps * duration), len(trajectory)), 1)
+    # Сначала прореживаем (с последним шагом), чтобы не читать целиком траекторию, открытую с диска
+    trajectory = trajectory.every(max(len(trajectory) // (10 * num_frames), 1))
+    return trajectory.resample(np.linspace(trajectory.t[0], trajectory.t[-1], num_frames))
+
+
+def _setup_animation_axes(ax):
     plot_limit = 2 * INITIAL_DISTANCE
 
     spacecraft_line, = ax.plot([], [], 'b-', label='Spacecraft Trajectory')
@@ -80,23 +135,93 @@ def animate_trajectories(x_traj, y_traj, x_planet_traj, y_planet_traj):
     ax.grid(True)
     ax.legend()
 
+    return spacecraft_line, planet_line, spacecraft_point, planet_point
+
+
+# Линии растут инкрементально: каждый кадр дописывает одну точку в заранее выделенный буфер
+# (NaN-точки matplotlib не рисует), без повторной нарезки префиксов траектории
+def _frame_updater(frames, artists, start=0):
+    spacecraft_line, planet_line, spacecraft_point, planet_point = artists
+    buffers = np.full((4, len(frames)), np.nan)
+    buffers[:, :start] = frames.x[:start], frames.y[:start], frames.x_planet[:start], frames.y_planet[:start]
+
     def init():
-        spacecraft_line.set_data([], [])
-        planet_line.set_data([], [])
+        buffers[:, start:] = np.nan
+        spacecraft_line.set_data(buffers[0], buffers[1])
+        planet_line.set_data(buffers[2], buffers[3])
         spacecraft_point.set_data([], [])
         planet_point.set_data([], [])
-        return spacecraft_line, planet_line, spacecraft_point, planet_point
+        return artists
 
     def update(frame):
-        spacecraft_line.set_data(x_traj[:frame], y_traj[:frame])
-        planet_line.set_data(x_planet_traj[:frame], y_planet_traj[:frame])
-        spacecraft_point.set_data([x_traj[frame]], [y_traj[frame]])
-        planet_point.set_data([x_planet_traj[frame]], [y_planet_traj[frame]])
-        return spacecraft_line, planet_line, spacecraft_point, planet_point
+        buffers[:, frame] = frames.x[frame], frames.y[frame], frames.x_planet[frame], frames.y_planet[frame]
+        spacecraft_line.set_data(buffers[0], buffers[1])
+        planet_line.set_data(buffers[2], buffers[3])
+        spacecraft_point.set_data(buffers[0, frame:frame + 1], buffers[1, frame:frame + 1])
+        planet_point.set_data(buffers[2, frame:frame + 1], buffers[3, frame:frame + 1])
+        return artists
+
+    return init, update
+
 
-    ani = FuncAnimation(fig, update, init_func=init, frames=len(x_traj),
-                        interval=50, blit=True, repeat=False)
+def _headless_figure():
+    # Фигура без pyplot и оконного бэкенда - для экспорта и рабочих процессов
+    fig = Figure(figsize=(10, 10))
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+def _render_chunk(frames, start, stop, directory):
+    fig, ax = _headless_figure()
+    init, update = _frame_updater(frames, _setup_animation_axes(ax), start)
+    init()
+    paths = []
+    for frame in range(start, stop):
+        update(frame)
+        paths.append(os.path.join(directory, f"frame_{frame:06d}.png"))
+        fig.savefig(paths[-1])
+    return paths
+
+
+def _assemble_video(paths, save_path, fps):
+    if save_path.endswith(".gif"):
+        images = [Image.open(path) for path in paths]
+        images[0].save(save_path, save_all=True, append_images=images[1:], duration=1000 / fps, loop=0)
+        return
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("Для сохранения видео в MP4 нужен ffmpeg")
+    pattern = os.path.join(os.path.dirname(paths[0]), "frame_%06d.png")
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps), "-i", pattern,
+                    "-pix_fmt", "yuv420p", save_path], check=True)
+
+
+# Экспорт анимации в GIF/MP4 без окна; кадры рендерятся кусками в workers процессах
+def save_animation(trajectory, save_path, fps=30, duration=20, workers=1):
+    frames = animation_frames(trajectory, fps, duration)
+
+    if workers <= 1:
+        fig, ax = _headless_figure()
+        init, update = _frame_updater(frames, _setup_animation_axes(ax))
+        ani = FuncAnimation(fig, update, init_func=init, frames=len(frames), interval=1000 / fps, blit=True, repeat=False)
+        ani.save(save_path, writer='pillow' if save_path.endswith(".gif") else 'ffmpeg', fps=fps)
+        return
+
+    bounds = np.linspace(0, len(frames), workers + 1, dtype=int)
+    with tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(_render_chunk, [frames] * workers, bounds[:-1], bounds[1:], [directory] * workers)
+        _assemble_video([path for chunk in chunks for path in chunk], save_path, fps)
+
+
+def animate_trajectories(trajectory, fps=30, duration=20, save_path=None, workers=1):
+    if save_path is not None:
+        save_animation(trajectory, save_path, fps, duration, workers)
+        return
+
+    frames = animation_frames(trajectory, fps, duration)
+    fig, ax = plt.subplots(figsize=(10, 10))
+    init, update = _frame_updater(frames, _setup_animation_axes(ax))
 
-    # ani.save(f'{method_name}.gif', writer='pillow', fps=10)
+    ani = FuncAnimation(fig, update, init_func=init, frames=len(frames),
+                        interval=1000 / fps, blit=True, repeat=False)
 
     plt.show()
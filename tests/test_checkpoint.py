@@ -0,0 +1,112 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+import main
+from checkpoint import Checkpointer
+from config import *
+from trajectory import Trajectory, TrajectoryWriter
+
+NUM_STEPS_TEST = 1000
+CHECKPOINT_EVERY = 300
+
+
+class Interrupted(Exception):
+    pass
+
+
+# Прерывание прогона сразу после stop-й контрольной точки - как если бы процесс убили
+class InterruptingCheckpointer(Checkpointer):
+    def __init__(self, path, every, config, stop):
+        super().__init__(path, every, config)
+        self.stop = stop
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.saved == self.stop:
+            raise Interrupted
+
+
+def run(method, num_steps, **kwargs):
+    if method == "rk4":
+        return main.rk4_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT,
+                               num_steps=num_steps, **kwargs)
+    if method == "adams_bashforth":
+        return main.adams_bashforth_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT,
+                                           V_Y_SPACECRAFT, num_steps=num_steps, **kwargs)
+    return main.leapfrog_method(X_SPACECRAFT, Y_SPACECRAFT, V_X_SPACECRAFT, V_Y_SPACECRAFT, num_steps=num_steps,
+                                **kwargs)
+
+
+def assert_same(expected, actual):
+    assert len(actual) == len(expected)
+    assert actual.crashed == expected.crashed
+    np.testing.assert_array_equal(np.asarray(actual._data), np.asarray(expected._data))
+
+
+@pytest.mark.parametrize("method", ["rk4", "leapfrog", "adams_bashforth"])
+@pytest.mark.parametrize("every", [1, 7])
+def test_resume_after_interruption(tmp_path, method, every):
+    path = str(tmp_path / "run.ckpt")
+    expected = run(method, NUM_STEPS_TEST, trajectory=Trajectory(NUM_STEPS_TEST, every))
+    with pytest.raises(Interrupted):
+        run(method, NUM_STEPS_TEST, trajectory=Trajectory(NUM_STEPS_TEST, every),
+            checkpoint=InterruptingCheckpointer(path, CHECKPOINT_EVERY, main.run_config(), stop=2))
+
+    assert_same(expected, main.resume_method(path, every=CHECKPOINT_EVERY))
+
+
+# Последний шаг прогона, пропущенный при прореживании, попадает и в финальную контрольную точку
+@pytest.mark.parametrize("method", ["rk4", "leapfrog", "adams_bashforth"])
+def test_resume_from_final_checkpoint(tmp_path, method):
+    path = str(tmp_path / "run.ckpt")
+    expected = run(method, NUM_STEPS_TEST, trajectory=Trajectory(NUM_STEPS_TEST, every=7),
+                   checkpoint=Checkpointer(path, CHECKPOINT_EVERY, main.run_config()))
+    assert expected.t[-1] == NUM_STEPS_TEST * DT
+
+    assert_same(expected, main.resume_method(path))
+
+
+# Продление законченного прогона совпадает с прогоном сразу на весь горизонт
+def test_extend_finished_run(tmp_path):
+    path = str(tmp_path / "run.ckpt")
+    run("rk4", NUM_STEPS_TEST, trajectory=Trajectory(NUM_STEPS_TEST, every=7),
+        checkpoint=Checkpointer(path, CHECKPOINT_EVERY, main.run_config()))
+    expected = run("rk4", 2 * NUM_STEPS_TEST, trajectory=Trajectory(2 * NUM_STEPS_TEST, every=7))
+
+    assert_same(expected, main.resume_method(path, num_steps=2 * NUM_STEPS_TEST))
+
+
+@pytest.mark.parametrize("method", ["rk4", "leapfrog", "adams_bashforth"])
+def test_resume_compensated(tmp_path, method):
+    path = str(tmp_path / "run.ckpt")
+    expected = run(method, NUM_STEPS_TEST, compensated=True)
+    with pytest.raises(Interrupted):
+        run(method, NUM_STEPS_TEST, compensated=True,
+            checkpoint=InterruptingCheckpointer(path, CHECKPOINT_EVERY, main.run_config(), stop=1))
+
+    assert_same(expected, main.resume_method(path))
+
+
+@pytest.mark.parametrize("stop", [1, 4])
+def test_resume_writer(tmp_path, stop):
+    path = str(tmp_path / "run.ckpt")
+    expected = run("rk4", NUM_STEPS_TEST, trajectory=TrajectoryWriter(str(tmp_path / "expected.bin"), every=7))
+    with pytest.raises(Interrupted):
+        run("rk4", NUM_STEPS_TEST, trajectory=TrajectoryWriter(str(tmp_path / "run.bin"), every=7),
+            checkpoint=InterruptingCheckpointer(path, CHECKPOINT_EVERY, main.run_config(), stop=stop))
+
+    assert_same(expected, main.resume_method(path))
+
+
+def test_checkpoint_of_other_config_is_rejected(tmp_path):
+    path = str(tmp_path / "run.ckpt")
+    run("rk4", 10, checkpoint=Checkpointer(path, 5, main.run_config()))
+    config = dict(main.run_config(), DT=DT / 2)
+
+    with pytest.raises(ValueError):
+        main.Checkpoint(path).check(config)
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+import main
+from config import *
+from trajectory import Trajectory
+
+
+@pytest.fixture(scope="module")
+def trajectory():
+    return main.rk4_method(X_SPACECRAFT, Y_SPACECRAFT, X_PLANET, Y_PLANET, V_X_SPACECRAFT, V_Y_SPACECRAFT,
+                           num_steps=300)
+
+
+def test_nodes_are_reproduced(trajectory):
+    state = main.dense_output(trajectory)(trajectory.t)
+
+    np.testing.assert_allclose(state, np.vstack((trajectory.x, trajectory.y, trajectory.v_x, trajectory.v_y)),
+                               rtol=1e-10)
+
+
+def test_scalar_time(trajectory):
+    dense = main.dense_output(trajectory)
+
+    assert dense(trajectory.t[-1]).shape == (4,)
+    np.testing.assert_array_equal(dense(trajectory.t[10] + 7.5), dense([trajectory.t[10] + 7.5])[:, 0])
+
+
+def test_times_outside_nodes_are_rejected(trajectory):
+    dense = main.dense_output(trajectory)
+
+    with pytest.raises(ValueError):
+        dense(trajectory.t[-1] + 1)
+    with pytest.raises(ValueError):
+        dense([trajectory.t[0] - 1, trajectory.t[0]])
+
+
+def test_single_row_is_rejected(trajectory):
+    with pytest.raises(ValueError):
+        main.dense_output(Trajectory.from_data(trajectory._data[:, :1]))